@@ -0,0 +1,9 @@
+# Headless conversion engine for PyFile Converter.
+# Kept free of heavy imports so `python -m pyfileconverter` starts quickly.
+from .engine import (
+    VALID_EXTENSIONS,
+    ConversionError,
+    ConversionSkipped,
+    convert_file,
+    normalize_extension,
+)
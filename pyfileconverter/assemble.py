@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+
+from .engine import IMG_SOURCE_EXTENSIONS, ConversionError, registry, run_route, source_format, temp_output_path
+from .events import stage
+from .images import open_image
+from .pdfwriter import LETTER, StreamingPdfWriter, pdf_number
+from .textpdf import write_text_pages
+
+# Many files --> one PDF.
+# Every input is written out (and released) before the next one is opened, so merging a thousand scans needs no
+# more memory than converting the largest of them. Images become one page each, text files flow over as many pages
+# as they need, and anything else with a route to .txt (ex: DOCX) goes through that route first.
+
+PAGE_SIZES = {'letter': LETTER, 'a4': (595.28, 841.89), 'legal': (612, 1008)}
+DEFAULT_DPI = 72  # For images that don't say what resolution they were scanned at
+
+
+def parse_page_size(value):
+    # "letter", "a4", "612x792" (points) or None / "auto" (every image page is the size of its image)
+    if value is None or isinstance(value, tuple):
+        return value
+    value = value.strip().lower()
+    if value == 'auto':
+        return None
+    if value in PAGE_SIZES:
+        return PAGE_SIZES[value]
+    width, _, height = value.partition('x')
+    try:
+        size = float(width), float(height)
+    except ValueError:
+        size = None
+    if size is None or min(size) <= 0:
+        raise ValueError(f"Invalid page size {value!r}: use {', '.join(PAGE_SIZES)}, auto or WIDTHxHEIGHT in points")
+    return size
+
+
+def image_placement(image_size, dpi, pagesize, margin):
+    # Returns (page size, (x, y, width, height) of the image on the page) in points
+    width, height = image_size[0] * 72.0 / dpi, image_size[1] * 72.0 / dpi
+    if pagesize is None:  # The page is the image's own size
+        return (width + 2 * margin, height + 2 * margin), (margin, margin, width, height)
+    scale = min((pagesize[0] - 2 * margin) / width, (pagesize[1] - 2 * margin) / height)
+    width, height = width * scale, height * scale
+    return pagesize, ((pagesize[0] - width) / 2, (pagesize[1] - height) / 2, width, height)
+
+
+def add_image_page(pdf, path, pagesize=None, margin=0):
+    with open_image(path) as img:  # Header only, for the resolution
+        dpi = img.info.get('dpi', (DEFAULT_DPI,))[0] or DEFAULT_DPI
+    with stage('decode'):
+        resource_name, obj_id, width, height = pdf.image(path)
+    page_size, (x, y, draw_width, draw_height) = image_placement((width, height), float(dpi), pagesize, margin)
+    content = b'q %s 0 0 %s %s %s cm /%s Do Q' % (pdf_number(draw_width), pdf_number(draw_height), pdf_number(x),
+                                                 pdf_number(y), resource_name)
+    with stage('encode'):
+        pdf.add_page(content, page_size, images=[(resource_name, obj_id)])
+
+
+def assemble_pdf(files, output_pdf_path, pagesize=None, margin=0, options=None):
+    # Writes every file, in order, into a single PDF and returns its page count.
+    # pagesize None keeps image pages at their image's size (text pages are then letter sized).
+    # Every input is checked before anything is written, and the PDF is written under a temporary name that only
+    # replaces output_pdf_path once it is complete, so a failed merge leaves whatever was there before untouched.
+    extensions = [source_format(file) for file in files]  # From the content, so a misnamed scan still lands as an image
+    for file, extension in zip(files, extensions):
+        if extension not in IMG_SOURCE_EXTENSIONS and extension != '.txt' and not registry.find_route(extension, '.txt'):
+            raise ConversionError(f"{extension or 'Extensionless'} files can't be added to a PDF, therefore: {file} was not added.")
+    temp_output = temp_output_path(output_pdf_path)
+    try:
+        page_count = write_pages(temp_output, files, extensions, output_pdf_path, pagesize, margin, options)
+        os.replace(temp_output, output_pdf_path)
+    finally:
+        if os.path.lexists(temp_output):
+            os.remove(temp_output)
+    return page_count
+
+
+def write_pages(path, files, extensions, output_pdf_path, pagesize=None, margin=0, options=None):
+    with StreamingPdfWriter(path, pagesize or LETTER) as pdf:
+        for file, extension in zip(files, extensions):
+            try:
+                if extension in IMG_SOURCE_EXTENSIONS:
+                    add_image_page(pdf, file, pagesize, margin)
+                elif extension == '.txt':
+                    write_text_pages(pdf, file, pagesize=pagesize or LETTER)
+                else:
+                    add_converted_text_pages(pdf, file, extension, pagesize or LETTER, options)
+            except ConversionError:
+                raise
+            except Exception as e:
+                raise ConversionError(f"Failed to add {file} to {output_pdf_path}: {e}") from e
+    return pdf.page_count
+
+
+def add_converted_text_pages(pdf, file, extension, pagesize, options=None):
+    route = registry.find_route(extension, '.txt')
+    if not route:
+        raise ConversionError(f"{extension or 'Extensionless'} files can't be added to a PDF, therefore: {file} was not added.")
+    temp_dir = tempfile.mkdtemp(prefix='pyfileconverter-')
+    try:
+        text_file = os.path.join(temp_dir, 'text.txt')
+        run_route(route, file, text_file, options)
+        write_text_pages(pdf, text_file, pagesize=pagesize)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,260 @@
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import convert_file
+from .events import peak_rss_mb
+
+# Conversion benchmarks on synthetic corpora.
+# Every corpus is generated offline from a fixed seed, so two runs (or two commits) convert exactly the same bytes.
+# Each (pair, size) case runs in a fresh worker process so its peak RSS is not inflated by the cases before it.
+
+SEED = 1234
+SIZES = ['small', 'medium', 'huge']
+
+# Files per corpus and the size of each file, per format. The "warmup" corpus is one tiny file, converted before a
+# case is timed so the converter's libraries are already imported (without converting a huge file twice).
+CORPUS_SPECS = {
+    'png': {'warmup': (1, (32, 32)), 'small': (40, (256, 256)), 'medium': (8, (2048, 1536)), 'huge': (2, (8000, 6000))},
+    'jpg': {'warmup': (1, (32, 32)), 'small': (40, (256, 256)), 'medium': (8, (2048, 1536)), 'huge': (2, (8000, 6000))},
+    'bmp': {'warmup': (1, (32, 32)), 'small': (40, (256, 256)), 'medium': (8, (2048, 1536)), 'huge': (2, (8000, 6000))},
+    'heic': {'warmup': (1, (32, 32)), 'small': (20, (256, 256)), 'medium': (4, (2048, 1536)), 'huge': (1, (8000, 6000))},
+    'txt': {'warmup': (1, 1_000), 'small': (40, 10_000), 'medium': (8, 2_000_000), 'huge': (1, 200_000_000)},  # Bytes
+    'docx': {'warmup': (1, 1), 'small': (20, 5), 'medium': (5, 200), 'huge': (1, 5_000)},  # Paragraphs of ~10 lines
+    'csv': {'warmup': (1, 1_000), 'small': (40, 20_000), 'medium': (4, 5_000_000), 'huge': (1, 1_000_000_000)},  # Bytes
+    'pdf': {'warmup': (1, 1), 'small': (20, 2), 'medium': (4, 50), 'huge': (1, 2_000)},  # Pages of text
+    'avi': {'warmup': (1, 1), 'small': (4, 5), 'medium': (2, 90), 'huge': (1, 1_800)},  # Seconds of video and audio
+    'mp4': {'warmup': (1, 1), 'small': (4, 5), 'medium': (2, 90), 'huge': (1, 1_800)},
+}
+
+# (source, target) pairs benchmarked by default, one per branch of the engine
+PAIRS = [
+    ('png', 'jpg'),  # Image re-encode
+    ('jpg', 'png'),
+    ('bmp', 'png'),
+    ('txt', 'pdf'),  # Streaming text_file_to_pdf
+    ('txt', 'docx'),  # Streaming TXT --> DOCX
+    ('docx', 'txt'),  # DOCX text extraction
+    ('docx', 'pdf'),  # docx2pdf (needs Word)
+    ('csv', 'txt'),  # Chunked CSV tables
+    ('csv', 'pdf'),
+    ('csv', 'docx'),
+    ('heic', 'jpg'),  # HEIC decoding (needs pillow-heif)
+    ('pdf', 'png'),  # PDF page rendering
+    ('avi', 'mp4'),  # Video encode, in parallel segments from 60 s on (needs ffmpeg)
+    ('mp4', 'mov'),  # Remux, the streams are copied
+    ('mp4', 'mp3'),  # Audio only
+]
+
+MEDIA_FORMATS = {'avi': ['-c:v', 'mpeg4', '-q:v', '5', '-c:a', 'libmp3lame'], 'mp4': ['-c:v', 'libx264', '-c:a', 'aac']}
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et '
+         'dolore magna aliqua ut enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea '
+         'commodo consequat').split()
+
+
+def text_lines(rng):
+    while True:
+        yield ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 18)))
+
+
+def make_image(path, size, rng):
+    from PIL import Image, ImageDraw
+    img = Image.linear_gradient('L').resize(size).convert('RGB')  # Smooth areas, like a photo or a scan
+    draw = ImageDraw.Draw(img)
+    for _ in range(200):  # Plus some edges so the encoders have real work to do
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.rectangle((x, y, x + rng.randint(5, size[0] // 4), y + rng.randint(5, size[1] // 4)),
+                       fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    img.save(path)
+
+
+def make_text(path, size, rng):
+    lines = text_lines(rng)
+    written = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        while written < size:
+            line = next(lines) + '\n'
+            file.write(line)
+            written += len(line)
+
+
+def make_heic(path, size, rng):
+    from .images import register_heif
+    register_heif()  # Raises ImportError without pillow-heif, which reports the case as unavailable
+    png_path = path + '.png'
+    make_image(png_path, size, rng)
+    from PIL import Image
+    with Image.open(png_path) as img:
+        img.save(path, 'HEIF')
+    os.remove(png_path)
+
+
+def make_pdf(path, pages, rng):
+    from .textpdf import text_file_to_pdf
+    text_path = path + '.txt'
+    make_text(text_path, pages * 3_000, rng)  # About 3 KB of text per page
+    text_file_to_pdf(text_path, path)
+    os.remove(text_path)
+
+
+def make_media(path, seconds, rng):
+    # A moving test pattern with a tone, from ffmpeg's own generators (the seed has nothing to vary here)
+    extension = os.path.splitext(path)[1].lstrip('.')
+    subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 'lavfi', '-i',
+                    'testsrc2=size=640x360:rate=25', '-f', 'lavfi', '-i', 'sine=frequency=440', '-t', str(seconds)] +
+                   MEDIA_FORMATS[extension] + [path], check=True)
+
+
+def make_docx(path, paragraphs, rng):
+    from docx import Document
+    lines = text_lines(rng)
+    document = Document()
+    document.add_heading('Synthetic document', 0)
+    for index in range(paragraphs):
+        if index % 25 == 0:
+            document.add_heading(f'Section {index // 25 + 1}', 1)
+        document.add_paragraph(' '.join(next(lines) for _ in range(10)))
+    document.save(path)
+
+
+def make_csv(path, size, rng):
+    # An export-like table: ids, dates, names, amounts and a free text column that sometimes needs quoting
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write('id,date,customer,email,amount,status,notes\n')
+        index = 0
+        while written < size:
+            notes = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+            if index % 50 == 0:
+                notes = f'"{notes}, ""quoted""\n{notes}"'
+            line = (f'{index},2024-{index % 12 + 1:02d}-{index % 28 + 1:02d},Customer {rng.randrange(50_000)},'
+                    f'user{rng.randrange(50_000)}@example.com,{rng.random() * 10_000:.2f},{rng.choice(WORDS)},{notes}\n')
+            file.write(line)
+            written += len(line)
+            index += 1
+
+
+GENERATORS = {'png': make_image, 'jpg': make_image, 'bmp': make_image, 'heic': make_heic, 'txt': make_text,
+              'docx': make_docx, 'csv': make_csv, 'pdf': make_pdf, 'avi': make_media, 'mp4': make_media}
+
+
+def build_corpus(corpus_dir, extension, size):
+    # Generates (or reuses) the corpus for one format and size, returns the paths of its files
+    count, file_size = CORPUS_SPECS[extension][size]
+    folder = os.path.join(corpus_dir, f"{extension}-{size}")
+    paths = [os.path.join(folder, f"{index:04d}.{extension}") for index in range(count)]
+    marker = os.path.join(folder, '.complete')
+    if os.path.exists(marker):
+        return paths
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(f"{SEED}-{extension}-{size}")
+    for path in paths:
+        GENERATORS[extension](path, file_size, rng)
+    open(marker, 'w').close()
+    return paths
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_case(paths, target_extension, warmup_path):
+    # Runs inside a fresh worker process: converts every file of the corpus and reports timings and peak RSS
+    output_dir = tempfile.mkdtemp(prefix='pyfileconverter-bench-')
+    latencies = []
+    try:
+        convert_file(warmup_path, target_extension, output_dir)  # Imports the converter's libraries
+        start = time.perf_counter()
+        for path in paths:
+            file_start = time.perf_counter()
+            convert_file(path, target_extension, output_dir)
+            latencies.append(time.perf_counter() - file_start)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return {'elapsed': elapsed, 'latencies': latencies, 'peak_rss_mb': peak_rss_mb()}
+
+
+def benchmark(pairs=PAIRS, sizes=('small', 'medium'), corpus_dir=None):
+    corpus_dir = corpus_dir or os.path.join(tempfile.gettempdir(), 'pyfileconverter-bench-corpus')
+    results = []
+    for source, target in pairs:
+        for size in sizes:
+            case = {'pair': f"{source}->{target}", 'size': size}
+            try:
+                paths = build_corpus(corpus_dir, source, size)
+                [warmup_path] = build_corpus(corpus_dir, source, 'warmup')
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    run = pool.submit(run_case, paths, '.' + target, warmup_path).result()
+            except Exception as e:  # Missing converter library or ffmpeg, no Word install, ...
+                case.update(status='unavailable', error=f"{type(e).__name__}: {e}")
+                results.append(case)
+                continue
+            total_bytes = sum(os.path.getsize(path) for path in paths)
+            case.update(
+                status='ok',
+                files=len(paths),
+                input_mb=round(total_bytes / 1e6, 3),
+                files_per_sec=round(len(paths) / run['elapsed'], 3),
+                mb_per_sec=round(total_bytes / 1e6 / run['elapsed'], 3),
+                p50_ms=round(percentile(run['latencies'], 0.50) * 1000, 2),
+                p99_ms=round(percentile(run['latencies'], 0.99) * 1000, 2),
+                peak_rss_mb=run['peak_rss_mb'],
+            )
+            results.append(case)
+    return {'meta': run_metadata(), 'results': results}
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': SEED,
+    }
+
+
+def compare(baseline, current, threshold=0.10):
+    # Returns lines describing cases whose throughput dropped (or peak RSS grew) by more than threshold
+    previous = {(case['pair'], case['size']): case for case in baseline['results'] if case.get('status') == 'ok'}
+    lines = []
+    for case in current['results']:
+        old = previous.get((case['pair'], case['size']))
+        if case.get('status') != 'ok' or old is None:
+            continue
+        speed = case['files_per_sec'] / old['files_per_sec'] - 1
+        if speed < -threshold:
+            lines.append(f"SLOWER {case['pair']} ({case['size']}): {old['files_per_sec']} --> "
+                         f"{case['files_per_sec']} files/sec ({speed:+.0%})")
+        if old.get('peak_rss_mb') and case.get('peak_rss_mb'):
+            memory = case['peak_rss_mb'] / old['peak_rss_mb'] - 1
+            if memory > threshold:
+                lines.append(f"MORE MEMORY {case['pair']} ({case['size']}): {old['peak_rss_mb']} --> "
+                             f"{case['peak_rss_mb']} MB peak RSS ({memory:+.0%})")
+    return lines
+
+
+def format_table(report):
+    header = f"{'pair':<12}{'size':<8}{'files':>6}{'files/s':>10}{'MB/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'RSS MB':>9}"
+    lines = [header, '-' * len(header)]
+    for case in report['results']:
+        if case['status'] != 'ok':
+            lines.append(f"{case['pair']:<12}{case['size']:<8}  unavailable ({case['error']})")
+            continue
+        lines.append(f"{case['pair']:<12}{case['size']:<8}{case['files']:>6}{case['files_per_sec']:>10}"
+                     f"{case['mb_per_sec']:>9}{case['p50_ms']:>10}{case['p99_ms']:>10}{str(case['peak_rss_mb']):>9}")
+    return '\n'.join(lines)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+# Content-addressed conversion cache.
+# Outputs are stored under a key made from the source file's content hash, the converter that produced them, its
+# version and its options, so re-running a batch of unchanged files only has to link/copy the stored outputs.
+# The index is a small sqlite database, which is safe to share between the worker processes of a batch.
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+HASH_CHUNK_SIZE = 1 << 20
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pyfileconverter')
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+FICLONE = 0x40049409  # Linux ioctl that makes a file share another file's data blocks (btrfs, XFS, ...)
+
+
+def clone_file(source, destination):
+    # Copies source to destination without moving the bytes through Python when the OS allows it: a reflink
+    # (copy-on-write clone) first, then copy_file_range (done inside the kernel), then a regular copy.
+    # Returns how the copy was made.
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            import fcntl
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return 'reflink'
+        except (ImportError, OSError):  # Windows, macOS, or a filesystem without reflinks
+            pass
+        if hasattr(os, 'copy_file_range'):
+            try:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining <= 0:
+                    return 'copy_file_range'
+            except OSError:  # Not supported between these filesystems
+                pass
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+        return 'copy'
+
+
+def place_file(source, destination, link=True):
+    # Puts a copy of source at destination, hardlinking when possible (same filesystem) and cloning/copying otherwise.
+    # Returns how the file was placed.
+    if os.path.lexists(destination):
+        os.remove(destination)
+    if link:
+        try:
+            os.link(source, destination)
+            return 'hardlink'
+        except OSError:
+            pass
+    return clone_file(source, destination)
+
+
+class ConversionCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, link=True):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.link = link
+        self._db = None
+
+    def __getstate__(self):
+        # The sqlite connection can't cross into worker processes, each process opens its own
+        state = self.__dict__.copy()
+        state['_db'] = None
+        return state
+
+    @property
+    def db(self):
+        if self._db is None:
+            os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), timeout=30, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries '
+                             '(key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS sources '
+                             '(path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL)')
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def source_digest(self, path):
+        # Hashes the source file, remembering the hash by path, size and mtime so unchanged files are only read once
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.db.execute('SELECT size, mtime_ns, digest FROM sources WHERE path = ?', (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        digest = file_digest(path)
+        self.db.execute('INSERT OR REPLACE INTO sources (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)',
+                        (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def key_for(self, source_path, converter, version, target_extension, options=None):
+        parts = [self.source_digest(source_path), converter, str(version), target_extension,
+                 json.dumps(options or {}, sort_keys=True)]
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    def object_path(self, key):
+        return os.path.join(self.directory, 'objects', key[:2], key)
+
+    def fetch(self, key, output_path):
+        # Places the cached output for key at output_path, returns False on a cache miss
+        row = self.db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return False
+        object_path = self.object_path(key)
+        try:
+            place_file(object_path, output_path, self.link)
+        except FileNotFoundError:  # The object was evicted (or deleted by hand) after we read the index
+            self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            return False
+        self.db.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+        return True
+
+    def store(self, key, output_path):
+        # Adds a freshly converted output to the cache, then evicts the least recently used entries if over budget
+        size = os.path.getsize(output_path)
+        if size > self.max_bytes:
+            return
+        object_path = self.object_path(key)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path), prefix='.tmp-')
+        os.close(fd)
+        try:
+            place_file(output_path, temp_path, self.link)
+            os.replace(temp_path, object_path)  # Atomic, so other workers never see a half written object
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.db.execute('INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)',
+                        (key, size, time.time()))
+        self.evict()
+
+    def total_bytes(self):
+        return self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        excess = self.total_bytes() - max_bytes
+        if excess <= 0:
+            return
+        for key, size in self.db.execute('SELECT key, size FROM entries ORDER BY last_used').fetchall():
+            self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            try:
+                os.remove(self.object_path(key))
+            except FileNotFoundError:
+                pass
+            excess -= size
+            if excess <= 0:
+                break
+
+    def clear(self):
+        self.evict(max_bytes=0)
+        self.db.execute('DELETE FROM sources')
@@ -0,0 +1,278 @@
+import argparse
+import glob
+import json
+import os
+
+from .cache import DEFAULT_MAX_BYTES, ConversionCache, default_cache_dir
+from .engine import VALID_EXTENSIONS, ConversionError, normalize_extension
+from .events import PROGRESS, BatchSummary, JsonLinesLog
+from .scheduler import FAILED, BatchScheduler, default_worker_count
+
+
+def expand_paths(patterns):
+    # Expands globs (including "**") and keeps plain paths as they are, dropping duplicates but keeping order
+    files = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            print(f"WARNING: No files matched {pattern}")
+        for match in matches:
+            if os.path.isdir(match) or match in seen:
+                continue
+            seen.add(match)
+            files.append(match)
+    return files
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pyfileconverter", description="Convert files without opening the UI.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert files to another filetype")
+    convert_parser.add_argument("--to", dest="to", required=True, type=normalize_extension,
+                                help=f"Output filetype, one of: {', '.join(VALID_EXTENSIONS)}")
+    convert_parser.add_argument("-o", "--output-dir", default=None,
+                                help="Directory for the converted files (defaults to next to each input)")
+    convert_parser.add_argument("-j", "--workers", type=int, default=default_worker_count(),
+                                help="Number of worker processes (default: %(default)s)")
+    convert_parser.add_argument("--cache-dir", default=default_cache_dir(),
+                                help="Where converted outputs are cached for re-runs (default: %(default)s)")
+    convert_parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                                help="Cache size limit in MB, least recently used outputs are evicted (default: %(default)s)")
+    convert_parser.add_argument("--no-cache", action="store_true", help="Always convert, never use the cache")
+    convert_parser.add_argument("--max-size", default=None,
+                                help="Downscale images to fit in WIDTHxHEIGHT (ex: 2048x2048, or just 2048)")
+    convert_parser.add_argument("--max-pixels", type=int, default=None,
+                                help="Refuse images with more pixels than this, checked before decoding")
+    convert_parser.add_argument("--memory-budget", type=int, default=None,
+                                help="Memory budget per worker in MB; larger images are refused before decoding")
+    convert_parser.add_argument("--quality", type=int, default=None,
+                                help="JPEG quality, 1-95 (also re-encodes JPEGs converted to JPEG)")
+    convert_parser.add_argument("--compress-level", type=int, default=None,
+                                help="PNG compression level, 0 (fastest) to 9 (smallest)")
+    convert_parser.add_argument("--progressive", action="store_true", default=None, help="Write progressive JPEGs")
+    convert_parser.add_argument("--optimize", action="store_true", default=None,
+                                help="Extra encoder pass for smaller JPEG/PNG files (slower)")
+    convert_parser.add_argument("--page", type=int, default=None,
+                                help="Page of a PDF to convert to an image (default: the first)")
+    convert_parser.add_argument("--dpi", type=int, default=None,
+                                help="Resolution PDF pages are rendered at (default: 150)")
+    convert_parser.add_argument("--paragraphs", choices=["lines", "blocks"], default=None,
+                                help="TXT --> DOCX: a paragraph per line (default) or per block of lines between blank lines")
+    convert_parser.add_argument("--segment-seconds", type=float, default=None,
+                                help="Video: length of the segments encoded in parallel (default: 30)")
+    convert_parser.add_argument("--events-log", default=None,
+                                help="Append a JSON line per file event (queued, started, finished, ...) to this file")
+    convert_parser.add_argument("-q", "--quiet", action="store_true", help="Only print errors and the summary")
+    convert_parser.add_argument("paths", nargs="+", help="Files or glob patterns (quote them to use **)")
+
+    merge_parser = subparsers.add_parser("merge", help="Combine images and text files into one PDF")
+    merge_parser.add_argument("-o", "--output", required=True, help="PDF file to write")
+    merge_parser.add_argument("--page-size", default="auto",
+                              help="letter, a4, legal, WIDTHxHEIGHT in points, or auto to size each image page to "
+                                   "its image (default: %(default)s)")
+    merge_parser.add_argument("--margin", type=float, default=0, help="Margin around images, in points")
+    merge_parser.add_argument("paths", nargs="+", help="Files or glob patterns, added in the order given")
+
+    render_parser = subparsers.add_parser("render", help="Save the pages of a PDF as images")
+    render_parser.add_argument("pdf", help="PDF file to render")
+    render_parser.add_argument("--to", dest="to", default=".png", type=normalize_extension,
+                               help="Image filetype (default: %(default)s)")
+    render_parser.add_argument("-o", "--output-dir", default=None,
+                               help="Directory for the page images (defaults to next to the PDF)")
+    render_parser.add_argument("--pages", default=None, help="Pages to render (ex: 1-3,7,10-), defaults to all")
+    render_parser.add_argument("--dpi", type=int, default=150, help="Resolution (default: %(default)s)")
+
+    watch_parser = subparsers.add_parser("watch", help="Convert files as they appear in a folder")
+    watch_parser.add_argument("inbox", help="Folder to watch (subfolders included)")
+    watch_parser.add_argument("--to", dest="to", required=True, type=normalize_extension,
+                              help=f"Output filetype, one of: {', '.join(VALID_EXTENSIONS)}")
+    watch_parser.add_argument("-o", "--output-dir", required=True,
+                              help="Directory for the converted files, mirroring the inbox's subfolders")
+    watch_parser.add_argument("-j", "--workers", type=int, default=default_worker_count(),
+                              help="Number of worker processes (default: %(default)s)")
+    watch_parser.add_argument("--manifest", default=None,
+                              help="Record of converted files, so restarts skip them (default: in the output dir)")
+    watch_parser.add_argument("--settle", type=float, default=2.0,
+                              help="Seconds a file's size must stay the same before it is converted (default: %(default)s)")
+    watch_parser.add_argument("--interval", type=float, default=2.0,
+                              help="Seconds between checks for changes (default: %(default)s)")
+    watch_parser.add_argument("--full-scan-interval", type=float, default=600.0,
+                              help="Seconds between full rescans, which catch files modified in place (default: %(default)s)")
+    watch_parser.add_argument("--polling", action="store_true",
+                              help="Poll the folder even when native change notifications are available")
+    watch_parser.add_argument("--once", action="store_true",
+                              help="Convert what is in the inbox now, then exit")
+    watch_parser.add_argument("--cache-dir", default=default_cache_dir(),
+                              help="Where converted outputs are cached for re-runs (default: %(default)s)")
+    watch_parser.add_argument("--no-cache", action="store_true", help="Always convert, never use the cache")
+    watch_parser.add_argument("--events-log", default=None,
+                              help="Append a JSON line per file event (queued, started, finished, ...) to this file")
+
+    bench_parser = subparsers.add_parser("bench", help="Benchmark the converters on synthetic files")
+    bench_parser.add_argument("--pairs", default=None,
+                              help="Comma separated source:target pairs (ex: png:jpg,txt:pdf), defaults to all of them")
+    bench_parser.add_argument("--sizes", default="small,medium",
+                              help="Comma separated corpus sizes out of small, medium, huge (default: %(default)s)")
+    bench_parser.add_argument("--corpus-dir", default=None,
+                              help="Where the generated files are kept between runs (default: the temp directory)")
+    bench_parser.add_argument("--output", default=None, help="Save the results as JSON")
+    bench_parser.add_argument("--compare", default=None,
+                              help="JSON results of an earlier run, regressions over 10%% are listed")
+    return parser
+
+
+def print_progress(event):
+    # Observer for long conversions (ex: videos), which report how far along they are every second or so
+    if event.kind == PROGRESS:
+        print(f"{event.file}: {event.describe_progress()}")
+
+
+def run_convert(args):
+    if args.to not in VALID_EXTENSIONS:
+        print(f"ERROR: Invalid conversion extension {args.to}")
+        return 2
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = 0
+    cache = None if args.no_cache else ConversionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    memory_budget = args.memory_budget * 1024 * 1024 if args.memory_budget else None
+    summary = BatchSummary()
+    observers = [summary]
+    events_log = JsonLinesLog(args.events_log) if args.events_log else None
+    if events_log:
+        observers.append(events_log)
+    if not args.quiet:
+        observers.append(print_progress)
+    scheduler = BatchScheduler(workers=args.workers, cache=cache, memory_budget=memory_budget, observers=observers)
+    options = {'max_size': args.max_size, 'max_pixels': args.max_pixels, 'page': args.page, 'dpi': args.dpi,
+               'quality': args.quality, 'compress_level': args.compress_level, 'progressive': args.progressive,
+               'optimize': args.optimize, 'paragraphs': args.paragraphs, 'segment_seconds': args.segment_seconds}
+    try:
+        for result in scheduler.run(expand_paths(args.paths), args.to, args.output_dir, options):
+            if result.status == FAILED:
+                print(f"ERROR: {result.message}")
+                failed += 1
+            elif not args.quiet:
+                print(result.message)
+    except KeyboardInterrupt:
+        scheduler.cancel()
+        scheduler.wait()
+        print("Cancelled")
+        return 130
+    finally:
+        if events_log:
+            events_log.close()
+    print(summary.describe())
+    return 1 if failed else 0
+
+
+def run_merge(args):
+    from .assemble import assemble_pdf, parse_page_size
+    try:
+        page_size = parse_page_size(args.page_size)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 2
+    files = expand_paths(args.paths)
+    if not files:
+        print("ERROR: No files to merge")
+        return 2
+    try:
+        page_count = assemble_pdf(files, args.output, page_size, args.margin)
+    except ConversionError as e:  # assemble_pdf only ever replaces args.output with a complete PDF
+        print(f"ERROR: {e}")
+        return 1
+    print(f"Successfully merged {len(files)} files into {args.output} ({page_count} pages)")
+    return 0
+
+
+def run_render(args):
+    from .images import PIL_FORMATS
+    from .pdfrender import render_pdf
+    if args.to not in PIL_FORMATS or args.to == '.pdf':
+        print(f"ERROR: Invalid image extension {args.to}")
+        return 2
+    output_dir = args.output_dir or os.path.dirname(os.path.abspath(args.pdf))
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        for output_file in render_pdf(args.pdf, output_dir, args.to, args.pages, args.dpi):
+            print(f"Rendered {output_file}")
+    except Exception as e:  # PdfRenderError, or a damaged PDF
+        print(f"ERROR: {e}")
+        return 1
+    return 0
+
+
+def run_watch(args):
+    from .watch import FolderWatcher
+    if args.to not in VALID_EXTENSIONS:
+        print(f"ERROR: Invalid conversion extension {args.to}")
+        return 2
+    if not os.path.isdir(args.inbox):
+        print(f"ERROR: {args.inbox} is not a folder")
+        return 2
+
+    cache = None if args.no_cache else ConversionCache(args.cache_dir)
+    events_log = JsonLinesLog(args.events_log) if args.events_log else None
+    watcher = FolderWatcher(args.inbox, args.output_dir, args.to, manifest_path=args.manifest,
+                            settle_seconds=args.settle, poll_interval=args.interval,
+                            full_scan_interval=args.full_scan_interval, workers=args.workers, cache=cache,
+                            observers=[events_log] if events_log else (), use_native_events=not args.polling)
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        print("Stopped")
+    finally:
+        if events_log:
+            events_log.close()
+    return 0
+
+
+def run_bench(args):
+    from . import bench  # Only loaded when benchmarking
+    pairs = bench.PAIRS
+    if args.pairs:
+        pairs = [tuple(ext.strip().lstrip('.').lower() for ext in pair.split(':')) for pair in args.pairs.split(',')]
+    sizes = [size.strip() for size in args.sizes.split(',')]
+    for source, _ in pairs:
+        if source not in bench.CORPUS_SPECS:
+            print(f"ERROR: No synthetic corpus for .{source} files")
+            return 2
+    for size in sizes:
+        if size not in bench.SIZES:
+            print(f"ERROR: Unknown corpus size {size}")
+            return 2
+
+    report = bench.benchmark(pairs, sizes, args.corpus_dir)
+    print(bench.format_table(report))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results saved to {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = bench.compare(json.load(file), report)
+        for line in regressions:
+            print(line)
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "convert":
+        return run_convert(args)
+    if args.command == "merge":
+        return run_merge(args)
+    if args.command == "render":
+        return run_render(args)
+    if args.command == "watch":
+        return run_watch(args)
+    if args.command == "bench":
+        return run_bench(args)
+    return 2
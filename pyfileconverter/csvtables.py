@@ -0,0 +1,204 @@
+import csv
+import itertools
+
+from .docxwriter import StreamingDocxWriter
+from .docxwriter import LETTER as DOCX_LETTER
+from .events import stage
+from .formats import text_encoding_of
+from .pdfwriter import StreamingPdfWriter, pdf_number
+from .textpdf import FontMeasure, clean_line
+
+# CSV --> TXT / PDF / DOCX tables.
+# Rows are parsed CHUNK_ROWS at a time and each chunk is written out before the next one is read, so a multi-GB
+# export converts in the same memory as a small one. Column widths can't wait for the last row, so they are sized
+# from the first SAMPLE_ROWS rows; a longer value further down overflows its column (TXT) or is cut short (PDF).
+# The first row is treated as the header: it is bold in PDF and DOCX and repeated at the top of every page.
+
+CHUNK_ROWS = 10_000
+SAMPLE_ROWS = 1_000
+SNIFF_BYTES = 16 * 1024  # Read to guess the delimiter and quoting
+MAX_COLUMN_CHARS = 60  # Widest a fixed-width TXT column gets, from the sample
+LANDSCAPE_LETTER = (792, 612)  # Tables are usually wider than they are tall
+ELLIPSIS = '...'
+WIDEST_CHARACTER = 1.02  # In ems; no character of the standard fonts is wider (Helvetica's "@" is the widest)
+
+
+def open_csv(csv_path, encoding=None):
+    # Returns the open file and a csv.reader with the delimiter guessed from the start of the file. Only the
+    # delimiter is taken from the Sniffer, its guesses about quoting are often wrong on quoted multi-line cells.
+    # encoding None opens the file in the encoding detected from its first bytes (Excel likes UTF-16 and cp1252).
+    file = open(csv_path, 'r', encoding=encoding or text_encoding_of(csv_path, 'utf-8-sig'), errors='replace', newline='')
+    sample = file.read(SNIFF_BYTES)
+    file.seek(0)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:  # One column, or nothing to go on
+        delimiter = ','
+    return file, csv.reader(file, delimiter=delimiter)
+
+
+def read_chunks(reader, chunk_rows=CHUNK_ROWS):
+    while True:
+        with stage('decode'):
+            chunk = list(itertools.islice(reader, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+def fit_row(row, column_count):
+    # Pads short rows, and folds the extra cells of long rows into the last column rather than dropping them
+    if len(row) < column_count:
+        return row + [''] * (column_count - len(row))
+    if len(row) > column_count:
+        return row[:column_count - 1] + [', '.join(row[column_count - 1:])]
+    return row
+
+
+def one_line(cell):
+    return cell.replace('\r\n', ' ').replace('\n', ' ').replace('\r', ' ')
+
+
+def csv_to_txt(csv_path, output_txt_path, separator='  '):
+    # Fixed-width columns, a dashed line under the header
+    file, reader = open_csv(csv_path)
+    with file, open(output_txt_path, 'w', encoding='utf-8') as output:
+        chunks = read_chunks(reader)
+        first = next(chunks, [])
+        sample = first[:SAMPLE_ROWS]
+        column_count = max((len(row) for row in sample), default=0)
+        widths = [0] * column_count
+        for row in sample:
+            for index, cell in enumerate(row):
+                widths[index] = max(widths[index], min(len(one_line(cell)), MAX_COLUMN_CHARS))
+
+        for chunk_index, chunk in enumerate(itertools.chain([first], chunks)):
+            lines = [separator.join(one_line(cell).ljust(width)
+                                    for cell, width in zip(fit_row(row, column_count), widths)).rstrip()
+                     for row in chunk]
+            if not lines:
+                continue
+            if chunk_index == 0:
+                lines.insert(1, separator.join('-' * width for width in widths))
+            with stage('encode'):
+                output.write('\n'.join(lines))
+                output.write('\n')
+
+
+def fit_text(text, width, measure):
+    # Cuts text down (ending it with "...") until it fits in width
+    if measure.width(text) <= width:
+        return text
+    return text[:measure.fit(text, width - measure.width(ELLIPSIS))] + ELLIPSIS
+
+
+def pdf_column_widths(sample, column_count, measure, bold_measure, table_width, padding):
+    # Natural width of every column in the sample, scaled so the table spans the page. Scaling up leaves room for
+    # the values further down that are longer than the sample's (growing ids, ...).
+    widths = [0.0] * column_count
+    for row_index, row in enumerate(sample):
+        row_measure = bold_measure if row_index == 0 else measure
+        for index, cell in enumerate(row[:column_count]):
+            widths[index] = max(widths[index], row_measure.width(clean_line(cell)) + 2 * padding)
+    narrowest = measure.width('0' * 8) + 2 * padding  # Room for ids and numbers that outgrow the sample
+    widths = [min(max(width, narrowest), table_width / 2) for width in widths]  # No column takes over the page
+    total = sum(widths)
+    return [width * table_width / total for width in widths]
+
+
+def csv_to_pdf(csv_path, output_pdf_path, font_name="Helvetica", bold_font_name="Helvetica-Bold", font_size=8,
+               margin=36, pagesize=LANDSCAPE_LETTER):
+    width, height = pagesize
+    row_height = font_size * 1.5
+    padding = font_size * 0.4
+    rows_per_page = max(1, int((height - 2 * margin) / row_height) - 1)  # Minus the header on every page
+    measure = FontMeasure(font_name, font_size)
+    bold_measure = FontMeasure(bold_font_name, font_size)
+
+    file, reader = open_csv(csv_path)
+    with file, StreamingPdfWriter(output_pdf_path, pagesize) as pdf:
+        font = pdf.font(font_name)
+        bold_font = pdf.font(bold_font_name)
+        chunks = read_chunks(reader)
+        first = next(chunks, [])
+        column_count = max((len(row) for row in first[:SAMPLE_ROWS]), default=0)
+        widths = pdf_column_widths(first[:SAMPLE_ROWS], column_count, measure, bold_measure, width - 2 * margin,
+                                   padding)
+        lefts = [f'{margin + sum(widths[:index]) + padding:.2f}' for index in range(column_count)]
+        text_widths = [cell_width - 2 * padding for cell_width in widths]
+        # Cells with at most this many characters fit whatever they are, so they skip measuring
+        safe_lengths = [int(text_width / (WIDEST_CHARACTER * font_size)) for text_width in text_widths]
+        table_width = sum(widths)
+        top = height - margin
+        # Baseline of every row on a page, the header's first
+        baselines = [f'{top - (index + 1) * row_height + (row_height - font_size) / 2 + font_size * 0.2:.2f}'
+                     for index in range(rows_per_page + 1)]
+
+        def row_markup(row, y, row_measure):
+            # Built as str and encoded once per page: encoding every cell on its own costs more than the layout
+            markup = []
+            for cell, left, text_width, safe_length in zip(fit_row(row, column_count), lefts, text_widths, safe_lengths):
+                if cell:
+                    text = clean_line(cell)
+                    if len(text) > safe_length:
+                        text = fit_text(text, text_width, row_measure)
+                    if '(' in text or ')' in text or '\\' in text:
+                        text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+                    markup.append(f'1 0 0 1 {left} {y} Tm ({text}) Tj\n')
+            return ''.join(markup)
+
+        header = first[0] if first else []
+        header_markup = b'BT /%s %s Tf\n%s/%s %s Tf\n' % (bold_font, pdf_number(font_size),
+                                                          row_markup(header, baselines[0], bold_measure).encode('cp1252'),
+                                                          font, pdf_number(font_size))
+        page_rows = []
+
+        # Grey band behind the header, then light stripes on every other row
+        header_band = b'0.85 g %s %s %s %s re f 0 g' % (pdf_number(margin), pdf_number(round(top - row_height, 2)),
+                                                        pdf_number(round(table_width, 2)), pdf_number(row_height))
+        stripes = [b'0.95 g %s %s %s %s re f 0 g' % (pdf_number(margin), pdf_number(round(top - (index + 1) * row_height, 2)),
+                                                     pdf_number(round(table_width, 2)), pdf_number(row_height))
+                   for index in range(1, rows_per_page + 1, 2)]
+
+        def flush_page():
+            content = [header_band] + stripes[:(len(page_rows) + 1) // 2]
+            content.append(header_markup)
+            rows = ''.join(row_markup(row, baselines[index + 1], measure) for index, row in enumerate(page_rows))
+            content.append(rows.encode('cp1252', 'replace'))
+            content.append(b'ET')
+            with stage('encode'):
+                pdf.add_page(b'\n'.join(content))
+            page_rows.clear()
+
+        for chunk_index, chunk in enumerate(itertools.chain([first], chunks)):
+            for row in (chunk[1:] if chunk_index == 0 else chunk):
+                page_rows.append(row)
+                if len(page_rows) >= rows_per_page:
+                    flush_page()
+        if page_rows or not pdf.page_count:
+            flush_page()
+    return pdf.page_count
+
+
+def csv_to_docx(csv_path, output_docx_path):
+    # One table, its header row repeated on every page Word lays it out over
+    file, reader = open_csv(csv_path)
+    with file, StreamingDocxWriter(output_docx_path, pagesize=DOCX_LETTER[::-1], margin=720) as docx:
+        chunks = read_chunks(reader)
+        first = next(chunks, [])
+        sample = first[:SAMPLE_ROWS]
+        column_count = max((len(row) for row in sample), default=0)
+        if not column_count:
+            return
+        characters = [1] * column_count
+        for row in sample:
+            for index, cell in enumerate(row):
+                characters[index] = max(characters[index], min(len(cell), MAX_COLUMN_CHARS))
+        total = sum(characters)
+        docx.start_table([docx.text_width * count / total for count in characters])
+
+        for chunk_index, chunk in enumerate(itertools.chain([first], chunks)):
+            with stage('encode'):
+                for row_index, row in enumerate(chunk):
+                    docx.table_row(fit_row(row, column_count), header=chunk_index == 0 and row_index == 0)
+        docx.end_table()
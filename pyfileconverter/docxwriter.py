@@ -0,0 +1,145 @@
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# python-docx builds the whole document as an XML tree in memory before saving it, and every table row it adds is a
+# deep copy, so a table with a million rows takes minutes and gigabytes. This writer streams word/document.xml
+# straight into the .docx zip instead, a buffer of markup at a time, like StreamingPdfWriter does for PDFs.
+
+FLUSH_SIZE = 1 << 20  # Characters of markup buffered before they are compressed into the zip
+LETTER = (12240, 15840)  # Page size in twips (1/20 of a point)
+MARGIN = 1440
+
+# Characters XML 1.0 can't contain at all (most control characters, lone surrogates, U+FFFE/U+FFFF)
+XML_INVALID_CHARACTERS = re.compile('[^\x09\x0a\x0d\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+PACKAGE_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+RUN_BREAKS = re.compile('(\t|\r?\n)')
+TABLE_BORDERS = ''.join(f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+                        for side in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'))
+
+
+def xml_text(text):
+    # Escapes text for a <w:t> element, dropping only the characters XML can't hold
+    if not (text.isascii() and text.isprintable()):  # Printable ASCII is always valid, and most text is just that
+        text = XML_INVALID_CHARACTERS.sub('', text)
+    return escape(text)
+
+
+def run_markup(text, bold=False):
+    # One run of text; tabs and line breaks become <w:tab/> and <w:br/> so Word keeps them
+    properties = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    if '\t' not in text and '\n' not in text:
+        return f'<w:r>{properties}<w:t xml:space="preserve">{xml_text(text)}</w:t></w:r>'
+    parts = []
+    for part in RUN_BREAKS.split(text):
+        if part == '\t':
+            parts.append('<w:tab/>')
+        elif part in ('\n', '\r\n'):
+            parts.append('<w:br/>')
+        elif part:
+            parts.append(f'<w:t xml:space="preserve">{xml_text(part)}</w:t>')
+    return f'<w:r>{properties}{"".join(parts)}</w:r>'
+
+
+class StreamingDocxWriter:
+    def __init__(self, output_path, pagesize=LETTER, margin=MARGIN):
+        self.pagesize = pagesize
+        self.margin = margin
+        self.paragraph_count = 0
+        self._zip = zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED)
+        self._zip.writestr('[Content_Types].xml', CONTENT_TYPES)
+        self._zip.writestr('_rels/.rels', PACKAGE_RELATIONSHIPS)
+        self._document = self._zip.open('word/document.xml', 'w', force_zip64=True)  # Parts can't be added after
+        self._buffer = [DOCUMENT_START]
+        self._buffered = len(DOCUMENT_START)
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._document.close()
+            self._zip.close()
+
+    @property
+    def text_width(self):
+        # Width between the margins, in twips
+        return self.pagesize[0] - 2 * self.margin
+
+    def write(self, markup):
+        # Appends raw WordprocessingML to the body
+        self._buffer.append(markup)
+        self._buffered += len(markup)
+        if self._buffered >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self._document.write(''.join(self._buffer).encode('utf-8'))
+        self._buffer.clear()
+        self._buffered = 0
+
+    def paragraph(self, text="", bold=False):
+        self.paragraph_count += 1
+        self.write(f'<w:p>{run_markup(text, bold)}</w:p>' if text else '<w:p/>')
+
+    def paragraphs(self, texts, bold=False):
+        # Many paragraphs in one write, which is much cheaper than a paragraph() call for every line of a big file
+        markup = [f'<w:p>{run_markup(text, bold)}</w:p>' if text else '<w:p/>' for text in texts]
+        self.paragraph_count += len(markup)
+        self.write(''.join(markup))
+
+    def page_break(self):
+        self.write('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    def start_table(self, column_widths):
+        # column_widths in twips; the table is laid out with those fixed widths and thin borders everywhere
+        grid = ''.join(f'<w:gridCol w:w="{int(width)}"/>' for width in column_widths)
+        self.write(f'<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/><w:tblBorders>{TABLE_BORDERS}</w:tblBorders>'
+                   f'<w:tblLayout w:type="fixed"/></w:tblPr><w:tblGrid>{grid}</w:tblGrid>')
+
+    def table_row(self, cells, header=False):
+        # A header row is bold and repeated at the top of every page the table runs over
+        properties = '<w:trPr><w:tblHeader/></w:trPr>' if header else ''
+        self.write(f'<w:tr>{properties}' + ''.join(
+            f'<w:tc><w:p>{run_markup(cell, header)}</w:p></w:tc>' if cell else '<w:tc><w:p/></w:tc>'
+            for cell in cells) + '</w:tr>')
+
+    def end_table(self):
+        self.write('</w:tbl><w:p/>')  # Word wants a paragraph between a table and the end of the document
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        width, height = self.pagesize
+        orientation = ' w:orient="landscape"' if width > height else ''
+        self.write(f'<w:sectPr><w:pgSz w:w="{width}" w:h="{height}"{orientation}/>'
+                   f'<w:pgMar w:top="{self.margin}" w:right="{self.margin}" w:bottom="{self.margin}" '
+                   f'w:left="{self.margin}" w:header="720" w:footer="720" w:gutter="0"/></w:sectPr>'
+                   '</w:body></w:document>')
+        self.flush()
+        self._document.close()
+        self._zip.close()
@@ -0,0 +1,320 @@
+import os  # For file accessing
+import shutil
+import tempfile
+import uuid
+
+from .cache import place_file
+from .csvtables import csv_to_docx, csv_to_pdf, csv_to_txt  # Chunked CSV tables
+from .events import stage
+from .formats import SIGNATURE_FORMATS, TEXT_FORMATS, canonical_extension, detect_format, same_format
+from .images import HEIF_EXTENSIONS, image_to_image, target_options  # Memory-bounded image pipeline
+from .media import MEDIA_EXTENSIONS, transcode_media  # Video / audio through ffmpeg
+from .pdfrender import pdf_to_image  # One page at a time PDF rendering
+from .registry import ConverterRegistry, normalize_extension
+from .textdocx import text_file_to_docx  # Streaming TXT --> DOCX
+from .textpdf import text_file_to_pdf  # Streaming TXT --> PDF
+
+# NOTE: The heavy conversion libraries (reportlab, docx2pdf, pypandoc, PIL, pillow-heif, pypdfium2, PyAV and python-docx)
+# are imported inside the converter that needs them, so importing the engine (or running the CLI) stays fast.
+
+# START - Extension groups (always compared against lowercased extensions, see normalize_extension)
+IMG_FILE_EXTENSIONS   = ['.bmp', '.jpg', '.jpeg', '.png']
+IMG_SOURCE_EXTENSIONS = IMG_FILE_EXTENSIONS + HEIF_EXTENSIONS  # HEIC can be read, not written
+TEXT_FILE_EXTENSIONS  = ['.txt', '.docx']
+VID_FILE_EXTENSIONS   = MEDIA_EXTENSIONS  # Defined with the media backend, see media.py
+VALID_EXTENSIONS      = ['.bmp', '.jpg', '.jpeg', '.png', '.pdf', '.txt', '.docx', '.csv', '.mp4', '.mov', '.avi', '.mp3']
+# STOP - Extension groups
+
+# Every converter the engine knows about, see the registrations below
+registry = ConverterRegistry()
+
+# Options that only decide whether a file may be converted or how many cores it gets, never what the output looks
+# like (not part of cache keys)
+LIMIT_OPTIONS = frozenset(['max_pixels', 'memory_budget', 'segment_workers'])
+
+# Files handed to a batch converter in one call (ex: one Word session for up to 50 DOCX --> PDF conversions)
+BATCH_SIZE = 50
+
+
+class ConversionError(Exception):
+    # Raised when a file cannot be converted to the requested extension
+    pass
+
+
+class ConversionSkipped(ConversionError):
+    # Raised when there is nothing to do (ex: the file already has the requested extension)
+    pass
+
+
+def output_path_for(file, conversion_extension, output_dir=None):
+    # Swap the extension of the file, optionally moving the output into another directory
+    base = os.path.splitext(file)[0]
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    return base + conversion_extension
+
+
+@registry.register('docx_to_pdf', ['.docx'], ['.pdf'], cost=3, requires=['docx2pdf'])  # Keeps the layout, but needs Word
+def docx_to_pdf(docx_file_path, output_pdf_path):
+    from docx2pdf import convert
+    # Convert the DOCX file to PDF
+    convert(docx_file_path, output_pdf_path)
+
+
+@registry.register_batch('docx_to_pdf')
+def docx_to_pdf_batch(jobs):
+    # docx2pdf starts Word (or the macOS automation script) once per call, so hand it a whole directory instead
+    # of one file at a time. Inputs are staged under numbered names so files with the same name can't collide.
+    from docx2pdf import convert
+    input_dir = tempfile.mkdtemp(prefix='pyfileconverter-docx-')
+    output_dir = tempfile.mkdtemp(prefix='pyfileconverter-pdf-')
+    failures = {}
+    try:
+        for index, (docx_file_path, _) in enumerate(jobs):
+            place_file(docx_file_path, os.path.join(input_dir, f"{index}.docx"))
+        convert(input_dir, output_dir)
+        for index, (docx_file_path, output_pdf_path) in enumerate(jobs):
+            converted = os.path.join(output_dir, f"{index}.pdf")
+            if os.path.exists(converted):
+                place_output(converted, output_pdf_path)
+            else:
+                failures[docx_file_path] = f"Word did not produce a PDF for {docx_file_path}"
+    finally:
+        shutil.rmtree(input_dir, ignore_errors=True)
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return failures
+
+
+@registry.register('docx_to_txt', ['.docx'], ['.txt'], cost=2, version=2, requires=[('docx', 'pypandoc')])
+def docx_to_txt(docx_file_path, output_txt_path):
+    # Fast path: read the text straight out of the document with python-docx, no pandoc process per file
+    try:
+        from docx import Document
+    except ImportError:
+        import pypandoc
+        pypandoc.convert_file(docx_file_path, 'plain', outputfile=output_txt_path)
+        return
+
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+    with stage('decode'):
+        document = Document(docx_file_path)
+    with open(output_txt_path, 'w', encoding='utf-8') as output:
+        for child in document.element.body.iterchildren():  # Paragraphs and tables in document order
+            tag = child.tag.rsplit('}', 1)[-1]
+            if tag == 'p':
+                output.write(Paragraph(child, document).text + '\n')
+            elif tag == 'tbl':
+                for row in Table(child, document).rows:
+                    output.write('\t'.join(cell.text for cell in row.cells) + '\n')
+                output.write('\n')
+
+
+# Image --> Image lives in images.py, TXT --> PDF in textpdf.py, TXT --> DOCX in textdocx.py and video / audio in media.py
+registry.register('image_to_image', IMG_SOURCE_EXTENSIONS, IMG_FILE_EXTENSIONS + ['.pdf'], cost=1, version=2,
+                  takes_target=True, options=['max_size', 'max_pixels', 'memory_budget', 'quality', 'compress_level',
+                                                 'progressive', 'optimize'], requires=['PIL'],
+                  target_options=target_options)(image_to_image)
+registry.register('text_file_to_pdf', ['.txt'], ['.pdf'], cost=2, version=2, requires=['reportlab'])(text_file_to_pdf)
+registry.register('txt_to_docx', ['.txt'], ['.docx'], cost=2, version=2, options=['paragraphs'])(text_file_to_docx)
+registry.register('csv_to_txt', ['.csv'], ['.txt'], cost=1)(csv_to_txt)
+registry.register('csv_to_pdf', ['.csv'], ['.pdf'], cost=2, requires=['reportlab'])(csv_to_pdf)
+registry.register('csv_to_docx', ['.csv'], ['.docx'], cost=2)(csv_to_docx)
+registry.register('pdf_to_image', ['.pdf'], IMG_FILE_EXTENSIONS, cost=3, takes_target=True,
+                  options=['page', 'dpi'], requires=['PIL'], direct_only=True)(pdf_to_image)
+registry.register('transcode_media', MEDIA_EXTENSIONS, MEDIA_EXTENSIONS, cost=5, takes_target=True,
+                  options=['segment_seconds', 'segment_workers'], tools=['ffmpeg'])(transcode_media)
+
+
+def source_format(file):
+    # The extension the file's content says it is (not its name), raises ConversionError if the content contradicts
+    # a name that always comes with a signature (ex: an empty download named .png). Detections are cached per
+    # path, mtime and size (see formats.FormatIndex), so asking again for the same file costs a stat.
+    extension = normalize_extension(os.path.splitext(file)[1])
+    try:
+        detected = detect_format(file)
+    except OSError as e:
+        raise ConversionError(f"Could not read {file}: {e}") from e
+    if detected is None or detected.extension == '.txt':
+        if canonical_extension(extension) in SIGNATURE_FORMATS:  # Ex: an HTML error page saved as .docx
+            raise ConversionError(f"{file} does not look like a {extension} file, therefore it was not converted.")
+        if detected is None or extension in TEXT_FORMATS:  # Nothing to go on (ex: an empty file), or a .csv
+            return extension
+    return detected.extension
+
+
+def find_route(file, conversion_extension, options=None):
+    # Picks the cheapest chain of converters for a file, raises ConversionError if there is none.
+    # Routes start from what the file's content says it is, so a PNG saved as .jpg or a .log full of text still
+    # converts. An empty route means the file already is in the requested format and no re-encode options were
+    # given, so it only has to be copied (see copy_unchanged).
+    currentFileType = source_format(file)  # The current file's (real) type
+    if same_format(currentFileType, conversion_extension):
+        converter = registry.direct_converter(currentFileType, conversion_extension)
+        if converter is not None and set(converter.applied_options(options, conversion_extension)) - LIMIT_OPTIONS:
+            return [(converter, conversion_extension)]  # Re-encode (ex: JPEG quality, downscaling)
+        return []
+
+    route = registry.find_route(currentFileType, conversion_extension)
+    if route is None:
+        blocked = registry.find_route(currentFileType, conversion_extension, available_only=False)
+        if blocked:  # Only converters whose libraries are not installed lead there
+            missing = sorted({name for converter, _ in blocked for name in converter.missing_requirements()})
+            raise ConversionError(f"Converting {currentFileType} files to {conversion_extension} needs {', '.join(missing)} to be installed, therefore: {file} was not converted.")
+        if currentFileType in VID_FILE_EXTENSIONS:  # Video and audio files
+            raise ConversionError(f"Video and audio files can only be converted to {', '.join(MEDIA_EXTENSIONS)}, therefore: {file} was not converted.")
+        raise ConversionError(f"Converting {currentFileType or 'extensionless'} files to {conversion_extension} is not supported, therefore: {file} was not converted.")
+    return route
+
+
+def run_route(route, file, output_file, options=None):
+    # Runs each step of the route, passing intermediate files through a temporary directory.
+    # The output is written under a temporary name next to output_file and only moved into place once every step
+    # succeeded, so a failed conversion never leaves a partial file behind (nor replaces the source when a misnamed
+    # file, ex: a PNG named .jpg, is converted in place).
+    temp_output = temp_output_path(output_file)
+    try:
+        if len(route) == 1:
+            converter, target = route[0]
+            converter.run(file, temp_output, target, options)
+        else:
+            run_steps(route, file, temp_output, options)
+        os.replace(temp_output, output_file)  # Also replaces an output hardlinked to the cache without writing into it
+    finally:
+        if os.path.lexists(temp_output):
+            os.remove(temp_output)
+
+
+def temp_output_path(output_file):
+    # A name in the output's own directory (so os.replace stays a rename) that keeps its extension, which is how
+    # several converters pick their format (ex: ffmpeg). The file itself is left for the converter to create.
+    directory, name = os.path.split(os.path.abspath(output_file))
+    stem, extension = os.path.splitext(name)
+    return os.path.join(directory, f".{stem}.{uuid.uuid4().hex[:8]}.partial{extension}")
+
+
+def place_output(converted, output_file):
+    # Moves a finished output into place: copied (when it comes from another filesystem) next to output_file under a
+    # temporary name first, so output_file is only ever replaced by a complete file
+    temp_output = temp_output_path(output_file)
+    try:
+        shutil.move(converted, temp_output)
+        os.replace(temp_output, output_file)
+    finally:
+        if os.path.lexists(temp_output):
+            os.remove(temp_output)
+
+
+def run_steps(route, file, output_file, options=None):
+    temp_dir = tempfile.mkdtemp(prefix='pyfileconverter-')
+    try:
+        current = file
+        for index, (converter, target) in enumerate(route):
+            is_last = index == len(route) - 1
+            step_output = output_file if is_last else os.path.join(temp_dir, f"step{index}{target}")
+            converter.run(current, step_output, target, options)
+            current = step_output
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def copy_unchanged(file, output_file):
+    # Same-format fast path: hardlink, reflink or copy the file as it is instead of decoding and re-encoding it
+    if os.path.abspath(file) == os.path.abspath(output_file):
+        raise ConversionSkipped(f"The filetype of {file} matches the selected conversion type and therefore was not converted.")
+    with stage('encode'):
+        place_file(file, output_file)
+    return output_file
+
+
+def cache_key_for(cache, file, route, conversion_extension, options=None):
+    route_name = '+'.join(converter.name for converter, _ in route)
+    route_version = '+'.join(str(converter.version) for converter, _ in route)
+    route_options = {}
+    for converter, target in route:
+        route_options.update(converter.applied_options(options, target))
+    route_options = {name: value for name, value in route_options.items() if name not in LIMIT_OPTIONS}
+    return cache.key_for(file, route_name, route_version, conversion_extension, route_options)
+
+
+def convert_file(file, conversion_extension, output_dir=None, cache=None, options=None):
+    # Converts a single file and returns the path of the output file.
+    # Raises ConversionSkipped if there is nothing to do and ConversionError if the pair is not supported.
+    # When a ConversionCache is given, unchanged sources are served from the cache instead of being converted again.
+    # options is a dict of converter keyword arguments (ex: max_size for images), each converter picks its own.
+    conversion_extension = normalize_extension(conversion_extension)
+    if conversion_extension not in VALID_EXTENSIONS:  # Ensure that the inputted new file extension type is valid
+        raise ConversionError(f"Invalid conversion extension: {conversion_extension}")
+
+    route = find_route(file, conversion_extension, options)
+    output_file = output_path_for(file, conversion_extension, output_dir)
+    if not route:
+        return copy_unchanged(file, output_file)
+
+    if cache is None:
+        run_route(route, file, output_file, options)
+        return output_file
+
+    key = cache_key_for(cache, file, route, conversion_extension, options)
+    if cache.fetch(key, output_file):
+        return output_file
+    run_route(route, file, output_file, options)
+    cache.store(key, output_file)
+    return output_file
+
+
+def plan_batches(files, conversion_extension, batch_size=BATCH_SIZE):
+    # Yields lists of files: files whose converter has a batch implementation are grouped (up to batch_size per
+    # list), every other file is yielded on its own
+    conversion_extension = normalize_extension(conversion_extension)
+    groups = {}
+    for file in files:
+        try:
+            route = registry.find_route(source_format(file), conversion_extension)
+        except ConversionError:
+            yield [file]  # Reported by the worker that gets it
+            continue
+        if conversion_extension not in VALID_EXTENSIONS or not route or len(route) > 1 or route[0][0].batch_func is None:
+            yield [file]
+            continue
+        group = groups.setdefault(route[0][0].name, [])
+        group.append(file)
+        if len(group) >= batch_size:
+            yield group
+            groups[route[0][0].name] = []
+    for group in groups.values():
+        if group:
+            yield group
+
+
+def convert_batch(files, conversion_extension, output_dir=None, cache=None, options=None):
+    # Converts files that share a single-step route (see plan_batches) with one call to the converter's batch
+    # implementation. Returns a (file, output_file, error message) tuple per file, error message is None on success.
+    conversion_extension = normalize_extension(conversion_extension)
+    route = find_route(files[0], conversion_extension, options)
+    converter, target = route[0]
+    results = {}
+    jobs = []
+    keys = {}
+    for file in files:
+        output_file = output_path_for(file, conversion_extension, output_dir)
+        if cache is not None:
+            keys[file] = cache_key_for(cache, file, route, conversion_extension, options)
+            if cache.fetch(keys[file], output_file):
+                results[file] = (file, output_file, None)
+                continue
+        jobs.append((file, output_file))
+
+    if jobs:
+        try:
+            failures = converter.run_batch(jobs, target, options) or {}
+        except Exception as e:  # The whole batch failed (ex: Word is not installed)
+            failures = {file: f"Failed to convert {file}: {e}" for file, _ in jobs}
+        for file, output_file in jobs:
+            if file in failures:
+                results[file] = (file, None, failures[file])
+                continue
+            if cache is not None:
+                cache.store(keys[file], output_file)
+            results[file] = (file, output_file, None)
+    return [results[file] for file in files]
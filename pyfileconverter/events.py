@@ -0,0 +1,218 @@
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+
+# Structured progress events for a batch.
+# Every file goes through QUEUED --> STARTED --> one of FINISHED / SKIPPED / FAILED / CANCELLED. Long conversions
+# (ex: video transcodes) also send PROGRESS events while they run. Observers are plain callables that receive each
+# Event; they are called from the scheduler's threads, so UI observers should only hand the event over to the main
+# loop (see FileConverterApp.poll_conversion_results).
+
+QUEUED = "queued"
+STARTED = "started"
+FINISHED = "finished"
+SKIPPED = "skipped"
+FAILED = "failed"
+CANCELLED = "cancelled"
+PROGRESS = "progress"
+
+STAGES = ('decode', 'transform', 'encode')
+
+
+class Event:
+    def __init__(self, kind, file, output_file=None, message="", timings=None, bytes_in=None, bytes_out=None,
+                 peak_rss_mb=None, pid=None, timestamp=None, progress=None):
+        self.kind = kind
+        self.file = file
+        self.output_file = output_file
+        self.message = message
+        self.timings = timings or {}  # Seconds per stage, plus 'total'
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.peak_rss_mb = peak_rss_mb  # Peak RSS of the worker process so far, not of this file alone
+        self.pid = pid
+        self.timestamp = timestamp or time.time()
+        self.progress = progress or {}  # PROGRESS only: fraction (0-1, None if unknown), frames, fps, ...
+
+    def __repr__(self):
+        return f"Event({self.kind!r}, {self.file!r})"
+
+    def to_dict(self):
+        data = {'event': self.kind, 'file': self.file, 'time': round(self.timestamp, 6)}
+        for name in ('output_file', 'message', 'bytes_in', 'bytes_out', 'peak_rss_mb', 'pid'):
+            value = getattr(self, name)
+            if value not in (None, ""):
+                data[name] = value
+        if self.timings:
+            data['timings'] = {stage: round(seconds, 6) for stage, seconds in self.timings.items()}
+        if self.progress:
+            data['progress'] = self.progress
+        return data
+
+    def describe_progress(self):
+        # "42% (1,234 frames, 210.5 fps)"
+        parts = []
+        if self.progress.get('frames'):
+            parts.append(f"{self.progress['frames']:,} frames")
+        if self.progress.get('fps'):
+            parts.append(f"{self.progress['fps']} fps")
+        fraction = self.progress.get('fraction')
+        text = f"{fraction:.0%}" if fraction is not None else "working"
+        return f"{text} ({', '.join(parts)})" if parts else text
+
+
+# START - Stage timing (worker side)
+# Converters wrap their phases in `with stage('decode'):` and friends. Each worker process converts one file at a
+# time, so the totals of the file being converted are kept in a thread-local.
+_local = threading.local()
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(name, time.perf_counter() - start)
+
+
+def add_stage_time(name, seconds):
+    totals = getattr(_local, 'totals', None)
+    if totals is not None:
+        totals[name] = totals.get(name, 0.0) + seconds
+
+
+@contextmanager
+def record_stages():
+    # Collects the stage times of everything converted inside the block. Time no stage accounted for is reported
+    # as 'transform', so decode + transform + encode always adds up to the total.
+    previous = getattr(_local, 'totals', None)
+    totals = _local.totals = {}
+    start = time.perf_counter()
+    try:
+        yield totals
+    finally:
+        _local.totals = previous
+        total = time.perf_counter() - start
+        totals['transform'] = totals.get('transform', 0.0) + max(0.0, total - sum(totals.values()))
+        totals['total'] = total
+# STOP - Stage timing
+
+
+# START - Progress reports (worker side)
+# Converters that take a while call report_progress as they go. Inside a scheduler worker the reports are sent to
+# the dispatcher (see scheduler.init_worker), which emits them as PROGRESS events for the file being converted.
+# Workers also call report_started when they pick a file up, which the dispatcher emits as its STARTED event.
+# Anywhere else they are dropped. Unlike the stage totals these are process-wide, since converters may report from
+# their own threads.
+_progress_sink = None
+_progress_file = None
+
+
+def set_progress_sink(sink):
+    # sink is called with (kind, file, progress dict, pid, timestamp), ex: the put method of a multiprocessing.Queue
+    global _progress_sink
+    _progress_sink = sink
+
+
+@contextmanager
+def reporting_progress(file):
+    global _progress_file
+    previous, _progress_file = _progress_file, file
+    try:
+        yield
+    finally:
+        _progress_file = previous
+
+
+def report_started(file):
+    sink = _progress_sink
+    if sink is not None:
+        sink((STARTED, file, None, os.getpid(), time.time()))
+
+
+def report_progress(**progress):
+    sink, file = _progress_sink, _progress_file
+    if sink is not None and file is not None:
+        sink((PROGRESS, file, progress, os.getpid(), time.time()))
+# STOP - Progress reports
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)  # Bytes on macOS, KB on Linux
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+class JsonLinesLog:
+    # Observer that appends one JSON object per event to a file
+    def __init__(self, path):
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            if event.kind not in (QUEUED, STARTED):
+                self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BatchSummary:
+    # Observer that keeps running totals for a progress bar and the summary at the end of a batch
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at = None
+        self.counts = {kind: 0 for kind in (QUEUED, FINISHED, SKIPPED, FAILED, CANCELLED)}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.failures = []  # (file, message), the first few are shown in the summary
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            if event.kind in self.counts:
+                self.counts[event.kind] += 1
+            if event.kind == FINISHED:
+                self.bytes_in += event.bytes_in or 0
+                self.bytes_out += event.bytes_out or 0
+                for name in STAGES:
+                    self.stage_seconds[name] += event.timings.get(name, 0.0)
+            elif event.kind == FAILED and len(self.failures) < 100:
+                self.failures.append((event.file, event.message))
+            self.finished_at = event.timestamp
+
+    @property
+    def total(self):
+        return self.counts[QUEUED]
+
+    @property
+    def done(self):
+        return sum(self.counts[kind] for kind in (FINISHED, SKIPPED, FAILED, CANCELLED))
+
+    @property
+    def elapsed(self):
+        return max(1e-9, (self.finished_at or time.time()) - self.started_at)
+
+    def describe(self):
+        return (f"Converted {self.counts[FINISHED]}, skipped {self.counts[SKIPPED]}, failed {self.counts[FAILED]}, "
+                f"cancelled {self.counts[CANCELLED]} of {self.total} files in {self.elapsed:.1f} s "
+                f"({self.counts[FINISHED] / self.elapsed:.1f} files/s, {self.bytes_in / 1e6 / self.elapsed:.2f} MB/s in, "
+                f"{self.bytes_in / 1e6:.1f} MB --> {self.bytes_out / 1e6:.1f} MB)")
@@ -0,0 +1,110 @@
+import itertools
+import os
+
+from .engine import VALID_EXTENSIONS, VID_FILE_EXTENSIONS, registry
+
+# Extensions picked up when importing whole folders (everything else in the tree is ignored)
+IMPORTABLE_EXTENSIONS = frozenset(registry.source_formats() | set(VALID_EXTENSIONS + VID_FILE_EXTENSIONS))
+
+
+class FileEntry:
+    __slots__ = ('entry_id', 'path', 'name', 'output_extension', 'status')
+
+    def __init__(self, entry_id, path, output_extension="Select Filetype", status=""):
+        self.entry_id = entry_id
+        self.path = path
+        self.name = os.path.basename(path)
+        self.output_extension = output_extension
+        self.status = status
+
+
+class FileListModel:
+    # Ordered list of imported files, tracked by a stable entry ID.
+    # Lookups by ID or by path are O(1) and the UI only asks for the rows it is currently showing,
+    # so the model stays fast with hundreds of thousands of entries.
+
+    def __init__(self):
+        self._entries = {}  # entry_id -> FileEntry (dicts keep insertion order)
+        self._ids_by_path = {}  # path -> entry_id, so the same file is never queued twice
+        self._order = []  # entry_ids by position, rebuilt lazily after removals
+        self._order_dirty = False
+        self._next_id = itertools.count(1)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def add_paths(self, paths):
+        # Adds the paths that are not in the list yet and returns the IDs of the new entries
+        new_ids = []
+        for path in paths:
+            if path in self._ids_by_path:
+                continue
+            entry_id = next(self._next_id)
+            self._entries[entry_id] = FileEntry(entry_id, path)
+            self._ids_by_path[path] = entry_id
+            new_ids.append(entry_id)
+        if not self._order_dirty:
+            self._order.extend(new_ids)
+        return new_ids
+
+    def remove(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            del self._ids_by_path[entry.path]
+            self._order_dirty = True
+
+    def clear(self):
+        self._entries.clear()
+        self._ids_by_path.clear()
+        self._order = []
+        self._order_dirty = False
+
+    def get(self, entry_id):
+        return self._entries.get(entry_id)
+
+    def id_for_path(self, path):
+        return self._ids_by_path.get(path)
+
+    def paths(self):
+        return [entry.path for entry in self._entries.values()]
+
+    def rows(self, start, count):
+        # Returns (position, FileEntry) pairs for the slice of the list that is on screen
+        if self._order_dirty:
+            self._order = list(self._entries)
+            self._order_dirty = False
+        return [(position, self._entries[entry_id])
+                for position, entry_id in enumerate(self._order[start:start + count], start=start)]
+
+    def set_status(self, path, status):
+        entry_id = self._ids_by_path.get(path)
+        if entry_id is not None:
+            self._entries[entry_id].status = status
+        return entry_id
+
+    def set_all_statuses(self, status):
+        for entry in self._entries.values():
+            entry.status = status
+
+
+def iter_folder_files(folder, recursive=True, extensions=IMPORTABLE_EXTENSIONS):
+    # Walks a folder with os.scandir (one stat-free pass per directory) and yields the importable files
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                subfolders = []
+                for dir_entry in it:
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            subfolders.append(dir_entry.path)
+                    elif os.path.splitext(dir_entry.name)[1].lower() in extensions:
+                        yield dir_entry.path
+        except OSError as e:
+            print(f"WARNING: Could not read {current}: {e}")
+            continue
+        pending.extend(reversed(sorted(subfolders)))  # Keeps the walk in alphabetical, depth-first order
@@ -0,0 +1,183 @@
+import codecs
+import os
+import struct
+import zipfile
+from collections import OrderedDict
+
+from .registry import normalize_extension
+
+# What a file really is, from its first bytes rather than its name.
+# Only the first SNIFF_BYTES of a file are read (plus, for the odd zip whose first entries don't give it away, its
+# central directory). Results are kept per path along with the file's mtime and size, so checking a 100k file batch
+# costs one small read per file, and checking it again costs a stat per file.
+
+SNIFF_BYTES = 4096
+
+# Extensions that name the same format
+SAME_FORMATS = {'.jpeg': '.jpg', '.heif': '.heic'}
+
+# Formats that always start with a signature: a file named like one of these whose bytes don't match is not one
+SIGNATURE_FORMATS = frozenset(['.jpg', '.png', '.bmp', '.pdf', '.docx', '.heic'])
+
+# Text formats whose names are kept when their content is plain text (anything else that is text is a .txt)
+TEXT_FORMATS = frozenset(['.txt', '.csv'])
+
+# ISO base media files (HEIC, MP4, MOV) say what they are with the "brands" of their ftyp box
+HEIC_BRANDS = frozenset([b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'hevm', b'hevs', b'mif1', b'msf1'])
+QUICKTIME_BRANDS = frozenset([b'qt  '])
+
+# Valid BMP info header sizes, which rule out text files that just happen to start with "BM"
+DIB_HEADER_SIZES = frozenset([12, 40, 52, 56, 64, 108, 124])
+
+# Bytes that may come before a PDF's header without being junk: a UTF-8 BOM and whitespace
+PDF_LEADING_BYTES = codecs.BOM_UTF8 + b' \t\r\n\x0c\x00'
+
+# Folders that identify the kind of Office document inside a zip
+OFFICE_FOLDERS = (('word/', '.docx'), ('xl/', '.xlsx'), ('ppt/', '.pptx'))
+
+
+class FileFormat:
+    __slots__ = ('extension', 'encoding')
+
+    def __init__(self, extension, encoding=None):
+        self.extension = extension
+        self.encoding = encoding  # Text only: the codec to read it with (ex: 'utf-8-sig', 'utf-16-le')
+
+    def __repr__(self):
+        return f"FileFormat({self.extension!r}, {self.encoding!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, FileFormat) and (self.extension, self.encoding) == (other.extension, other.encoding)
+
+
+def canonical_extension(extension):
+    extension = normalize_extension(extension)
+    return SAME_FORMATS.get(extension, extension)
+
+
+def same_format(first, second):
+    return canonical_extension(first) == canonical_extension(second)
+
+
+def zip_format(path, head):
+    # Walks the local file headers in head for a telltale folder, falling back to the zip's central directory
+    offset = 0
+    while head.startswith(b'PK\x03\x04', offset) and offset + 30 <= len(head):
+        flags, compressed_size, name_length, extra_length = struct.unpack_from('<H8xI4xHH', head, offset + 6)
+        name = head[offset + 30:offset + 30 + name_length].decode('cp437', 'replace')
+        for folder, extension in OFFICE_FOLDERS:
+            if name.startswith(folder):
+                return extension
+        if flags & 0x08:  # Sizes come after the data, so the next header can't be found from here
+            break
+        offset += 30 + name_length + extra_length + compressed_size
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return '.zip'
+    for folder, extension in OFFICE_FOLDERS:
+        if any(name.startswith(folder) for name in names):
+            return extension
+    return '.zip'
+
+
+def text_encoding(head):
+    # Returns the codec head decodes with if it looks like text, None if it looks binary
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'  # The BOM tells the codec which byte order
+    if b'\x00' in head:
+        # UTF-16 without a BOM: mostly ASCII text leaves every other byte zero
+        even, odd = head[0::2], head[1::2]
+        if odd.count(0) > len(odd) * 0.4 and even.count(0) < len(even) * 0.1:
+            return 'utf-16-le'
+        if even.count(0) > len(even) * 0.4 and odd.count(0) < len(odd) * 0.1:
+            return 'utf-16-be'
+        return None
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)  # head may end mid character
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    # Some 8-bit encoding; still text if control characters are rare
+    controls = sum(head.count(bytes([code])) for code in range(32) if code not in (9, 10, 12, 13))
+    return 'cp1252' if controls < len(head) * 0.01 else None
+
+
+def is_pdf(head):
+    # The header normally comes first (at most after a BOM or whitespace). Some writers put junk before it and readers
+    # allow up to 1 KB of that, but only binary junk is taken for it: text that merely mentions "%PDF-" is text.
+    if head.lstrip(PDF_LEADING_BYTES).startswith(b'%PDF-'):
+        return True
+    return b'%PDF-' in head[:1024] and text_encoding(head) is None
+
+
+def sniff_format(path):
+    # Returns the FileFormat found in the file's first bytes, or None if they don't say (ex: an empty file)
+    with open(path, 'rb') as file:
+        head = file.read(SNIFF_BYTES)
+    if not head:
+        return None
+    if head.startswith(b'\xff\xd8\xff'):
+        return FileFormat('.jpg')
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return FileFormat('.png')
+    if head.startswith(b'BM') and len(head) >= 26 and struct.unpack_from('<I', head, 14)[0] in DIB_HEADER_SIZES:
+        return FileFormat('.bmp')
+    if is_pdf(head):
+        return FileFormat('.pdf')
+    if head.startswith(b'PK\x03\x04'):
+        return FileFormat(zip_format(path, head))
+    if head[4:8] == b'ftyp':
+        box_end = min(len(head), struct.unpack_from('>I', head)[0])
+        brands = [head[8:12]] + [head[index:index + 4] for index in range(16, box_end, 4)]  # Major, then compatible
+        if brands[0] in HEIC_BRANDS and b'avif' not in brands:
+            return FileFormat('.heic')
+        return FileFormat('.mov' if brands[0] in QUICKTIME_BRANDS else '.mp4')
+    if head.startswith(b'RIFF') and head[8:12] == b'AVI ':
+        return FileFormat('.avi')
+    if head.startswith(b'ID3') or head[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return FileFormat('.mp3')
+    encoding = text_encoding(head)
+    if encoding is not None:
+        return FileFormat('.txt', encoding)
+    return None
+
+
+class FormatIndex:
+    # sniff_format results per path, reused for as long as the file's mtime and size stay the same
+    def __init__(self, max_entries=200_000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # path -> ((mtime_ns, size), FileFormat or None), least recently used first
+
+    def detect(self, path):
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == key:
+            self._entries.move_to_end(path)
+            return entry[1]
+        detected = sniff_format(path)
+        self._entries[path] = (key, detected)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return detected
+
+    def clear(self):
+        self._entries.clear()
+
+
+# One index per process (each worker keeps its own)
+format_index = FormatIndex()
+
+
+def detect_format(path):
+    return format_index.detect(path)
+
+
+def text_encoding_of(path, default='utf-8'):
+    # The codec to open a text file with, as detected from its first bytes
+    detected = detect_format(path)
+    return detected.encoding if detected is not None and detected.encoding else default
@@ -0,0 +1,167 @@
+from .events import stage
+from .formats import detect_format
+from .registry import normalize_extension
+
+# Memory-bounded image conversion.
+# Image.open only reads the header, so the size checks below happen before any pixels are decoded. JPEGs that are
+# being downscaled are decoded at 1/2, 1/4 or 1/8 scale (draft mode) instead of at full resolution, and mode
+# conversions are done in horizontal strips so a huge RGBA image is never copied whole.
+# HEIC/HEIF photos (iPhones save those) are read too when the optional pillow-heif package is installed.
+
+# PIL wants a format name rather than an extension (there is no "JPG" writer)
+PIL_FORMATS = {
+    '.bmp': 'BMP',
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.pdf': 'PDF'
+}
+
+# Modes each output format can store; anything else is converted to the first mode of the list
+SAVE_MODES = {
+    'BMP': ['RGB', '1', 'L', 'P', 'RGBA'],
+    'JPEG': ['RGB', 'L', 'CMYK'],
+    'PNG': ['RGBA', 'RGB', '1', 'L', 'LA', 'P', 'I', 'I;16'],
+    'PDF': ['RGB', '1', 'L', 'CMYK']
+}
+
+# Bytes PIL uses per pixel once decoded (3-band images are stored with 4 bytes per pixel)
+MODE_BYTES = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I': 4, 'F': 4, 'LA': 4, 'PA': 4, 'RGB': 4, 'RGBA': 4, 'CMYK': 4}
+
+STRIP_HEIGHT = 512  # Rows converted at a time by convert_mode
+BACKGROUND = (255, 255, 255)  # Transparent pixels are flattened onto white for formats without alpha
+
+
+# Encoder settings each output format understands, see save_options
+ENCODE_OPTIONS = {
+    'JPEG': ('quality', 'progressive', 'optimize'),
+    'PNG': ('compress_level', 'optimize'),
+}
+
+
+# Extensions that can be read but not written
+HEIF_EXTENSIONS = ['.heic', '.heif']
+
+_heif_registered = False
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def register_heif():
+    # pillow-heif plugs a HEIF opener into PIL; it is only loaded the first time a HEIC file shows up
+    global _heif_registered
+    if _heif_registered:
+        return
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError as e:
+        raise ImportError("Reading HEIC images needs the pillow-heif package (pip install pillow-heif)") from e
+    register_heif_opener()
+    _heif_registered = True
+
+
+def open_image(path):
+    # Image.open (which only reads the header) for every format the pipeline reads, HEIC included
+    from PIL import Image
+    detected = detect_format(path)
+    if detected is not None and detected.extension == '.heic':
+        register_heif()
+    return Image.open(path)
+
+
+def parse_size(value):
+    # "1920x1080" --> (1920, 1080), "2048" --> (2048, 2048)
+    if value is None or isinstance(value, tuple):
+        return value
+    width, _, height = str(value).lower().partition('x')
+    return int(width), int(height or width)
+
+
+def decoded_bytes(size, mode):
+    width, height = size
+    return width * height * MODE_BYTES.get(mode, 4)
+
+
+def check_budget(path, img, max_pixels=None, memory_budget=None):
+    # Refuses an image from its header alone, before a single pixel is decoded
+    width, height = img.size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLarge(f"{path} is {width}x{height} ({width * height:,} pixels), over the limit of {max_pixels:,} pixels")
+    if memory_budget:
+        # Decoded source + converted copy + output buffers, roughly
+        needed = decoded_bytes(img.size, img.mode) * 2
+        if needed > memory_budget:
+            raise ImageTooLarge(f"{path} needs about {needed // (1024 * 1024)} MB to convert, over the budget of "
+                                f"{memory_budget // (1024 * 1024)} MB per worker")
+
+
+def flatten_alpha(strip, target_mode):
+    from PIL import Image
+    background = Image.new('RGBA', strip.size, BACKGROUND + (255,))
+    background.alpha_composite(strip.convert('RGBA'))
+    return background.convert(target_mode)
+
+
+def convert_mode(img, target_mode, strip_height=STRIP_HEIGHT):
+    # Converts img to target_mode a strip at a time; alpha is flattened onto BACKGROUND when the target has none
+    from PIL import Image
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+    if img.mode == target_mode:
+        return img
+    if not has_alpha and img.height <= strip_height:
+        return img.convert(target_mode)
+
+    converted = Image.new(target_mode, img.size)
+    for top in range(0, img.height, strip_height):
+        box = (0, top, img.width, min(top + strip_height, img.height))
+        strip = img.crop(box)
+        if has_alpha and 'A' not in target_mode:
+            strip = flatten_alpha(strip, target_mode)
+        else:
+            strip = strip.convert(target_mode)
+        converted.paste(strip, box[:2])
+    return converted
+
+
+def save_options(pil_format, **options):
+    # Keeps the encoder settings that apply to pil_format (ex: quality for JPEG, compress_level for PNG), so one set
+    # of options can be given to a batch that writes several formats
+    return {name: value for name, value in options.items()
+            if value is not None and value is not False and name in ENCODE_OPTIONS.get(pil_format, ())}
+
+
+def target_options(conversion_extension, options):
+    # Drops the encoder settings that don't apply to the target (ex: quality when writing a PNG), see save_options
+    pil_format = PIL_FORMATS.get(normalize_extension(conversion_extension))
+    encoder_names = {name for names in ENCODE_OPTIONS.values() for name in names}
+    applied = save_options(pil_format, **options)
+    return {name: value for name, value in options.items() if name not in encoder_names or name in applied}
+
+
+def image_to_image(file, output_file, conversion_extension, max_size=None, max_pixels=None, memory_budget=None,
+                   quality=None, compress_level=None, progressive=None, optimize=None):
+    # quality (JPEG, 1-95), progressive (JPEG), compress_level (PNG, 0-9) and optimize (both) trade encoding time for
+    # file size; left out, PIL's defaults are used
+    from PIL import Image
+    pil_format = PIL_FORMATS[normalize_extension(conversion_extension)]
+    max_size = parse_size(max_size)
+
+    with open_image(file) as img:  # Only the header is read here
+        downscale = max_size and (img.width > max_size[0] or img.height > max_size[1])
+        with stage('decode'):
+            if downscale:
+                # JPEGs decode straight at a reduced scale, then the rest of the way down with a good filter
+                img.draft('RGB' if img.mode not in ('L', 'CMYK') else img.mode, max_size)
+            check_budget(file, img, max_pixels, memory_budget)
+            img.load()
+
+        with stage('transform'):
+            if downscale:
+                img.thumbnail(max_size, Image.LANCZOS)
+            if img.mode not in SAVE_MODES[pil_format]:
+                img = convert_mode(img, SAVE_MODES[pil_format][0])
+        with stage('encode'):
+            img.save(output_file, pil_format, **save_options(pil_format, quality=quality, compress_level=compress_level,
+                                                             progressive=progressive, optimize=optimize))
@@ -0,0 +1,379 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .events import report_progress, stage
+from .registry import normalize_extension
+
+# Video and audio --> video and audio with a local ffmpeg, on the CPU only (software encoders, no GPU needed).
+# The ffmpeg executable does all the decoding and encoding, so it is needed even when PyAV is installed.
+# Long videos are cut at keyframes into segments that separate ffmpeg processes encode in parallel, one per core
+# the file was given, and the encoded segments are then joined without re-encoding. The audio is encoded once, next to the segments,
+# so it has no seams. Streams the target container can hold as they are (ex: H.264 from a .mov going into an .mp4)
+# are copied instead of re-encoded. Inputs are probed with PyAV when it is installed, otherwise with ffprobe.
+# Progress (fraction done, frames and frames per second) goes out through events.report_progress.
+
+MEDIA_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mp3']
+
+# Software encoders per container: (video encoder, audio encoder)
+ENCODERS = {
+    '.mp4': ('libx264', 'aac'),
+    '.mov': ('libx264', 'aac'),
+    '.avi': ('mpeg4', 'libmp3lame'),
+    '.mp3': (None, 'libmp3lame'),
+}
+ENCODER_ARGUMENTS = {
+    'libx264': ['-preset', 'medium', '-crf', '23', '-pix_fmt', 'yuv420p'],
+    'mpeg4': ['-q:v', '4', '-pix_fmt', 'yuv420p'],
+    'aac': ['-b:a', '160k'],
+    'libmp3lame': ['-q:a', '2'],
+}
+
+# Codecs each container takes as they are, so a file whose streams are all in here is remuxed rather than re-encoded
+COPY_CODECS = {
+    '.mp4': {'h264', 'hevc', 'av1', 'mpeg4', 'aac', 'mp3', 'alac', 'opus'},
+    '.mov': {'h264', 'hevc', 'mpeg4', 'prores', 'mjpeg', 'aac', 'mp3', 'alac', 'pcm_s16le'},
+    '.avi': {'mpeg4', 'mjpeg', 'h264', 'mp3', 'ac3', 'pcm_s16le'},
+    '.mp3': {'mp3'},
+}
+
+SEGMENT_SECONDS = 30  # Length a parallel segment aims for (it ends at the first keyframe after that)
+MIN_PARALLEL_SECONDS = 60  # Shorter videos are encoded in one go
+PROGRESS_INTERVAL = 1.0  # Seconds between progress reports
+SEGMENT_FORMAT = '.mkv'  # Encoded segments are kept in Matroska, which holds any codec, until they are joined
+
+
+class MediaError(Exception):
+    pass
+
+
+class MediaInfo:
+    def __init__(self, duration, video_codec=None, audio_codec=None, frame_rate=None, start_time=0.0):
+        self.duration = duration  # Seconds, None if the container doesn't say
+        self.start_time = start_time  # Seconds, the container's first timestamp (ffmpeg's -ss counts from there)
+        self.video_codec = video_codec  # None for audio files (cover art doesn't count as video)
+        self.audio_codec = audio_codec
+        self.frame_rate = frame_rate
+
+
+def find_tool(name):
+    path = shutil.which(name)
+    if path is None:
+        raise MediaError(f"Converting video and audio needs {name} (part of FFmpeg) on the PATH")
+    return path
+
+
+def probe_media(path):
+    try:
+        import av
+    except ImportError:
+        return _probe_ffprobe(path)
+    try:
+        container = av.open(path)
+    except av.error.FFmpegError as e:
+        raise MediaError(f"Could not read {path}: {e}")
+    with container:
+        video = next((stream for stream in container.streams.video
+                      if not stream.disposition & av.stream.Disposition.attached_pic), None)
+        audio = next(iter(container.streams.audio), None)
+        return MediaInfo(container.duration / av.time_base if container.duration else None,
+                         video.codec_context.name if video is not None else None,
+                         audio.codec_context.name if audio is not None else None,
+                         float(video.average_rate) if video is not None and video.average_rate else None,
+                         container.start_time / av.time_base if container.start_time else 0.0)
+
+
+def _probe_ffprobe(path):
+    result = subprocess.run([find_tool('ffprobe'), '-v', 'error', '-show_entries',
+                             'format=duration,start_time:stream=codec_type,codec_name,avg_frame_rate:stream_disposition=attached_pic',
+                             '-of', 'json', path], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise MediaError(f"Could not read {path}: {result.stderr.strip()}")
+    probe = json.loads(result.stdout)
+    streams = probe.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'
+                  and not stream.get('disposition', {}).get('attached_pic')), None)
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    frame_rate = None
+    if video is not None and video.get('avg_frame_rate', '0/0') not in ('0/0', ''):
+        numerator, _, denominator = video['avg_frame_rate'].partition('/')
+        frame_rate = float(numerator) / float(denominator or 1) if float(denominator or 1) else None
+    duration = probe.get('format', {}).get('duration')
+    start_time = probe.get('format', {}).get('start_time')
+    return MediaInfo(float(duration) if duration else None, video and video.get('codec_name'),
+                     audio and audio.get('codec_name'), frame_rate, float(start_time) if start_time else 0.0)
+
+
+def video_packets(path):
+    # Returns (presentation times of every video packet, in order, and the times of the keyframes among them).
+    # Only packets are read, nothing is decoded. Times are rounded to microseconds like ffmpeg's own timestamps,
+    # so a keyframe's time given to -ss lands exactly on that keyframe.
+    try:
+        import av
+    except ImportError:
+        return _video_packets_ffprobe(path)
+    times, keyframes = array('d'), array('d')
+    with av.open(path) as container:
+        stream = next(stream for stream in container.streams.video
+                      if not stream.disposition & av.stream.Disposition.attached_pic)
+        for packet in container.demux(stream):
+            if packet.pts is None or packet.is_discard:  # The flush packet at the end, frames an edit list cuts
+                continue
+            packet_time = round(float(packet.pts * packet.time_base), 6)
+            times.append(packet_time)
+            if packet.is_keyframe:
+                keyframes.append(packet_time)
+    return array('d', sorted(times)), array('d', sorted(keyframes))
+
+
+def _video_packets_ffprobe(path):
+    times, keyframes = array('d'), array('d')
+    process = subprocess.Popen([find_tool('ffprobe'), '-v', 'error', '-select_streams', 'V:0', '-show_entries',
+                                'packet=pts_time,flags', '-of', 'csv=p=0', path], stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        packet_time, _, flags = line.strip().partition(',')
+        if packet_time in ('', 'N/A') or 'D' in flags:
+            continue
+        times.append(float(packet_time))
+        if 'K' in flags:
+            keyframes.append(float(packet_time))
+    if process.wait() != 0:
+        raise MediaError(f"Could not list the keyframes of {path}")
+    return array('d', sorted(times)), array('d', sorted(keyframes))
+
+
+def plan_segments(times, keyframes, segment_seconds=SEGMENT_SECONDS):
+    # Cuts the video at keyframes into [(start time, frame count), ...], each segment at least segment_seconds
+    # long except maybe the last (which is folded into the one before it when it would be under half of that)
+    if not times:
+        return []
+    end = times[-1]
+    starts = [times[0]]
+    for keyframe in keyframes:
+        if keyframe - starts[-1] >= segment_seconds and end - keyframe >= segment_seconds / 2:
+            starts.append(keyframe)
+    segments = []
+    position = 0
+    for index, start in enumerate(starts):
+        next_start = starts[index + 1] if index + 1 < len(starts) else None
+        count = 0
+        while position < len(times) and (next_start is None or times[position] < next_start):
+            position += 1
+            count += 1
+        segments.append((start, count))
+    return segments
+
+
+class TranscodeProgress:
+    # Adds up the progress of every ffmpeg process working on one file and reports it every PROGRESS_INTERVAL
+    def __init__(self, duration, total_frames=None):
+        self.duration = duration
+        self.total_frames = total_frames
+        self.started = time.perf_counter()
+        self._jobs = {}  # job --> (seconds of output written, frames written)
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, job, out_seconds, frames, final=False):
+        with self._lock:
+            self._jobs[job] = (out_seconds, frames)
+            now = time.perf_counter()
+            if not final and now - self._last_report < PROGRESS_INTERVAL:
+                return
+            self._last_report = now
+            seconds = sum(done for done, _ in self._jobs.values())
+            frames = sum(count for _, count in self._jobs.values())
+        elapsed = max(1e-9, now - self.started)
+        if self.total_frames:
+            fraction = frames / self.total_frames
+        else:
+            fraction = seconds / self.duration if self.duration else None
+        report_progress(fraction=round(min(1.0, fraction), 4) if fraction is not None else None, frames=frames,
+                        fps=round(frames / elapsed, 1), seconds=round(seconds, 2))
+
+
+class FfmpegJobs:
+    # Runs ffmpeg commands on a thread pool (the work happens in the ffmpeg processes, the threads only wait on them
+    # and read their progress), and stops every other process as soon as one fails
+    def __init__(self, progress, workers=1):
+        self.progress = progress
+        self.workers = workers
+        self._processes = []
+        self._failed = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, command, job, log_path, video=True):
+        # command without its output options for progress; video jobs count frames, audio jobs only add time
+        if self._failed.is_set():
+            return
+        command = command[:1] + ['-nostdin', '-hide_banner', '-loglevel', 'error', '-y', '-progress', 'pipe:1',
+                                 '-nostats'] + command[1:]
+        with open(log_path, 'w', encoding='utf-8', errors='replace') as log:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=log, text=True)
+            with self._lock:
+                self._processes.append(process)
+            values = {}
+            for line in process.stdout:
+                key, _, value = line.strip().partition('=')
+                values[key] = value
+                if key == 'progress':  # The last line of every progress block
+                    self._report(job, values, video, final=value == 'end')
+            returncode = process.wait()
+        if returncode != 0 and not self._failed.is_set():
+            self._failed.set()
+            self.stop()
+            with open(log_path, encoding='utf-8', errors='replace') as log:
+                message = log.read().strip().splitlines()[-3:]
+            raise MediaError(f"ffmpeg failed: {' '.join(message) or f'exit status {returncode}'}")
+
+    def _report(self, job, values, video, final):
+        try:
+            out_seconds = int(values.get('out_time_us', '0')) / 1e6
+        except ValueError:  # "N/A" before the first frame
+            out_seconds = 0.0
+        frames = int(values.get('frame', '0') or 0) if video else 0
+        self.progress.update(job, max(0.0, out_seconds) if video or not self.progress.total_frames else 0.0, frames,
+                             final)
+
+    def run_all(self, jobs):
+        # jobs: [(command, job, log path, video)], returns when all of them are done, raising the first failure
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(jobs)))) as pool:
+                futures = [pool.submit(self.run, *job) for job in jobs]
+                for future in futures:
+                    future.result()
+        finally:
+            self.stop()
+
+    def stop(self):
+        with self._lock:
+            for process in self._processes:
+                if process.poll() is None:
+                    process.kill()
+
+
+def encoder_arguments(kind, encoder):
+    # kind is 'v' or 'a'
+    return [f'-c:{kind}', encoder] + ENCODER_ARGUMENTS.get(encoder, [])
+
+
+def container_arguments(target):
+    if target in ('.mp4', '.mov'):
+        return ['-movflags', '+faststart']  # The index goes first, so the file can play while it downloads
+    return []
+
+
+@contextmanager
+def child_memory_limit_lifted():
+    # Scheduler workers cap their address space (see scheduler.limit_worker_memory) and every process they start
+    # inherits the cap, which is sized for one decoded image, not for ffmpeg's threads and frame queues. The soft
+    # limit is raised back to the hard one while the ffmpeg processes are started and restored afterwards; a worker
+    # converts one file at a time, so nothing else runs without its cap meanwhile.
+    try:
+        import resource
+    except ImportError:  # Not on Unix, and then the scheduler set no limit either
+        yield
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if soft == hard:
+        yield
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (hard, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def transcode_media(file, output_file, conversion_extension, segment_seconds=SEGMENT_SECONDS, segment_workers=None):
+    # Converts between .mp4, .mov, .avi and .mp3 (video --> .mp3 keeps the audio). segment_workers is how many cores
+    # the file may use, every core by default; a scheduler converting several files at once gives each a share
+    # (see scheduler.BatchScheduler.start), so the host runs about one ffmpeg process per core in total.
+    with child_memory_limit_lifted():
+        _transcode_media(file, output_file, conversion_extension, segment_seconds, segment_workers)
+
+
+def _transcode_media(file, output_file, conversion_extension, segment_seconds, segment_workers):
+    target = normalize_extension(conversion_extension)
+    if target not in ENCODERS:
+        raise MediaError(f"Can't write {target} files")
+    ffmpeg = find_tool('ffmpeg')
+    with stage('decode'):
+        info = probe_media(file)
+    video_encoder, audio_encoder = ENCODERS[target]
+    keep_video = info.video_codec is not None and video_encoder is not None
+    if not keep_video and info.audio_codec is None:
+        raise MediaError(f"{file} has no {'audio' if video_encoder is None else 'video or audio'} to convert")
+    workers = segment_workers or os.cpu_count() or 1
+
+    temp_dir = tempfile.mkdtemp(prefix='pyfileconverter-media-')
+    try:
+        # Streams the target can hold as they are are copied, only the others are encoded
+        copy_video = keep_video and info.video_codec in COPY_CODECS[target]
+        copy_audio = info.audio_codec in COPY_CODECS[target]
+        audio_arguments = ['-c:a', 'copy'] if copy_audio else encoder_arguments('a', audio_encoder)
+        encode_video = keep_video and not copy_video
+
+        segments = []
+        if encode_video and (info.duration or 0) >= MIN_PARALLEL_SECONDS and workers >= 2 and segment_seconds > 0:
+            with stage('decode'):
+                times, keyframes = video_packets(file)
+                segments = plan_segments(times, keyframes, segment_seconds)
+        if len(segments) < 2:
+            # One pass: remuxes, audio files, short videos, or nothing to run in parallel with (ex: one keyframe)
+            total_frames = None
+            if encode_video and info.duration and info.frame_rate:
+                total_frames = round(info.duration * info.frame_rate)
+            command = [ffmpeg, '-i', file]
+            if keep_video:
+                command += ['-map', '0:V:0'] + (['-c:v', 'copy'] if copy_video else encoder_arguments('v', video_encoder))
+            if info.audio_codec:
+                command += ['-map', '0:a:0'] + audio_arguments
+            jobs = FfmpegJobs(TranscodeProgress(info.duration, total_frames))
+            with stage('encode'):
+                jobs.run_all([(command + ['-threads', str(workers)] + container_arguments(target) + [output_file],
+                               'all', os.path.join(temp_dir, 'all.log'), encode_video)])
+            return
+
+        threads = max(1, workers // min(workers, len(segments)))  # Cores left over go to each encoder's own threads
+        jobs = FfmpegJobs(TranscodeProgress(info.duration, len(times)), workers)
+        commands = []
+        segment_paths = []
+        for index, (start, frame_count) in enumerate(segments):
+            # -ss before -i on a keyframe's exact time decodes from that keyframe, and -frames:v stops right before
+            # the next segment's first frame, so no frame is lost or doubled at the seams. ffmpeg adds the
+            # container's start time to -ss, while packet times already include it.
+            segment_path = os.path.join(temp_dir, f'segment{index:05d}{SEGMENT_FORMAT}')
+            segment_paths.append(segment_path)
+            seek = ['-ss', f'{start - info.start_time:.6f}'] if index else []  # The first one starts with the video
+            commands.append(([ffmpeg] + seek + ['-i', file, '-map', '0:V:0', '-an', '-sn', '-dn',
+                              '-frames:v', str(frame_count), '-threads', str(threads)] +
+                             encoder_arguments('v', video_encoder) + [segment_path],
+                             index, os.path.join(temp_dir, f'segment{index:05d}.log'), True))
+        audio_path = None
+        if info.audio_codec:
+            audio_path = os.path.join(temp_dir, 'audio' + SEGMENT_FORMAT)
+            commands.insert(0, ([ffmpeg, '-i', file, '-map', '0:a:0', '-vn'] + audio_arguments + [audio_path],
+                                'audio', os.path.join(temp_dir, 'audio.log'), False))  # Started first, it is one long job
+        with stage('encode'):
+            jobs.run_all(commands)
+
+            list_path = os.path.join(temp_dir, 'segments.txt')
+            with open(list_path, 'w', encoding='utf-8') as segment_list:
+                for segment_path in segment_paths:
+                    segment_list.write("file '%s'\n" % segment_path.replace("'", "'\\''"))
+            command = [ffmpeg, '-f', 'concat', '-safe', '0', '-i', list_path]
+            if audio_path:
+                command += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0']
+            join = FfmpegJobs(jobs.progress)  # Copies, so it adds no frames to the progress
+            join.run_all([(command + ['-c', 'copy'] + container_arguments(target) + [output_file], 'join',
+                           os.path.join(temp_dir, 'join.log'), False)])
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
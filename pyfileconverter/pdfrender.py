@@ -0,0 +1,109 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+from .events import stage
+from .images import PIL_FORMATS, SAVE_MODES, convert_mode
+from .registry import normalize_extension
+
+# PDF --> images, one page at a time.
+# Pages are rendered lazily: only the page being saved is ever in memory, so a 500 page PDF costs as much as
+# its largest page. pypdfium2 is used when it is installed, otherwise poppler's pdftoppm (one call per page).
+
+DEFAULT_DPI = 150
+
+
+class PdfRenderError(Exception):
+    pass
+
+
+def parse_page_range(spec, page_count):
+    # "1-3,7,10-" --> [1, 2, 3, 7, 10, 11, ...] (1-based, in the order given); None or "all" --> every page
+    if spec is None or str(spec).strip().lower() in ('', 'all'):
+        return list(range(1, page_count + 1))
+    pages = []
+    for part in str(spec).split(','):
+        start, dash, end = part.strip().partition('-')
+        try:
+            first = int(start) if start else 1
+            last = (int(end) if end else page_count) if dash else first
+        except ValueError:
+            raise PdfRenderError(f"Invalid page range: {spec}")
+        if first < 1 or last > page_count or first > last:
+            raise PdfRenderError(f"Page range {part.strip()} is outside of the document's {page_count} pages")
+        pages.extend(range(first, last + 1))
+    return pages
+
+
+def iter_pdf_pages(pdf_path, pages=None, dpi=DEFAULT_DPI):
+    # Yields (page number, PIL image) for the selected pages, rendering each one only when it is asked for
+    try:
+        import pypdfium2
+    except ImportError:
+        yield from _iter_pdftoppm_pages(pdf_path, pages, dpi)
+        return
+    document = pypdfium2.PdfDocument(pdf_path)
+    try:
+        for number in parse_page_range(pages, len(document)):
+            page = document[number - 1]
+            try:
+                with stage('decode'):
+                    img = page.render(scale=dpi / 72.0).to_pil()
+            finally:
+                page.close()
+            yield number, img
+    finally:
+        document.close()
+
+
+def _iter_pdftoppm_pages(pdf_path, pages, dpi):
+    if shutil.which('pdftoppm') is None:
+        raise PdfRenderError("Rendering PDFs needs the pypdfium2 package or poppler's pdftoppm")
+    from PIL import Image
+    info = subprocess.run(['pdfinfo', pdf_path], capture_output=True, text=True)
+    page_count = next((int(line.split()[-1]) for line in info.stdout.splitlines() if line.startswith('Pages:')), None)
+    if page_count is None:
+        raise PdfRenderError(f"Could not read the page count of {pdf_path}: {info.stderr.strip()}")
+    temp_dir = tempfile.mkdtemp(prefix='pyfileconverter-pdf-')
+    try:
+        for number in parse_page_range(pages, page_count):
+            prefix = os.path.join(temp_dir, 'page')
+            with stage('decode'):
+                result = subprocess.run(['pdftoppm', '-f', str(number), '-l', str(number), '-r', str(dpi), '-png',
+                                         '-singlefile', pdf_path, prefix], capture_output=True, text=True)
+                if result.returncode != 0:
+                    raise PdfRenderError(f"pdftoppm failed on page {number} of {pdf_path}: {result.stderr.strip()}")
+                with Image.open(prefix + '.png') as img:
+                    img.load()
+            os.remove(prefix + '.png')
+            yield number, img
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def save_page(img, output_file, conversion_extension):
+    pil_format = PIL_FORMATS[normalize_extension(conversion_extension)]
+    with stage('encode'):
+        if img.mode not in SAVE_MODES[pil_format]:
+            img = convert_mode(img, SAVE_MODES[pil_format][0])
+        img.save(output_file, pil_format)
+
+
+def render_pdf(pdf_path, output_dir, conversion_extension, pages=None, dpi=DEFAULT_DPI):
+    # Saves each selected page as <name>-<page number><extension> in output_dir, yielding the paths as it goes
+    conversion_extension = normalize_extension(conversion_extension)
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    for number, img in iter_pdf_pages(pdf_path, pages, dpi):
+        output_file = os.path.join(output_dir, f"{name}-{number}{conversion_extension}")
+        save_page(img, output_file, conversion_extension)
+        img.close()
+        yield output_file
+
+
+def pdf_to_image(pdf_path, output_file, conversion_extension, page=1, dpi=DEFAULT_DPI):
+    # Single-file converter for the registry: one PDF --> one image, of the given page (the first by default).
+    # Use render_pdf (or `pyfileconverter render`) to get several pages.
+    for _, img in iter_pdf_pages(pdf_path, str(page), dpi):
+        save_page(img, output_file, conversion_extension)
+        img.close()
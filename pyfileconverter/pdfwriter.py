@@ -0,0 +1,169 @@
+import zlib
+from array import array
+
+# reportlab's canvas keeps every page of the document in memory until save() is called.
+# This writer streams each page to disk as soon as it is added, so only the byte offsets of the
+# objects written so far are kept around (a few bytes per page) no matter how long the document gets.
+
+LETTER = (612, 792)  # Same as reportlab.lib.pagesizes.letter, in points
+COPY_CHUNK_SIZE = 1 << 20  # JPEG data is copied into the PDF 1 MB at a time
+IMAGE_STRIP_HEIGHT = 256  # Rows of other images compressed at a time
+JPEG_COLOR_SPACES = {'L': b'/DeviceGray', 'RGB': b'/DeviceRGB'}
+PAGE_GROUP_SIZE = 1000  # Pages per intermediate node of the page tree (readers choke on one flat list of 100k+)
+
+
+def pdf_string(text):
+    # Encodes text for a PDF literal string drawn with a WinAnsi (cp1252) encoded standard font
+    data = text.encode('ascii') if text.isascii() else text.encode('cp1252', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class StreamingPdfWriter:
+    def __init__(self, output_path, pagesize=LETTER, compress=True):
+        self.pagesize = pagesize
+        self.compress = compress
+        self._file = open(output_path, 'wb')
+        self._offsets = array('q', [0])  # Object number -> byte offset (object 0 is the free list head)
+        self._page_ids = array('q')  # 8 bytes per entry, so a 250,000 page table stays a few MB
+        self._group_ids = array('q')  # Intermediate page tree nodes, one per PAGE_GROUP_SIZE pages
+        self._fonts = {}  # Base font name -> (resource name, object number)
+        self._image_count = 0
+        self._pages_id = self._reserve_object()  # Written last, once every page is known
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    def _reserve_object(self):
+        self._offsets.append(0)
+        return len(self._offsets) - 1
+
+    def _write_object(self, obj_id, body):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(b'%d 0 obj\n' % obj_id)
+        self._file.write(body)
+        self._file.write(b'\nendobj\n')
+
+    def _write_stream(self, obj_id, data, extra=b''):
+        if self.compress:
+            data = zlib.compress(data)
+            extra += b' /Filter /FlateDecode'
+        self._write_object(obj_id, b'<< /Length %d%s >>\nstream\n' % (len(data), extra) + data + b'\nendstream')
+
+    def _write_stream_chunks(self, obj_id, chunks, extra=b''):
+        # Like _write_stream, but the data is never held whole: its length is written afterwards as its own object
+        length_id = self._reserve_object()
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(b'%d 0 obj\n<< /Length %d 0 R%s >>\nstream\n' % (obj_id, length_id, extra))
+        start = self._file.tell()
+        for chunk in chunks:
+            self._file.write(chunk)
+        length = self._file.tell() - start
+        self._file.write(b'\nendstream\nendobj\n')
+        self._write_object(length_id, b'%d' % length)
+
+    def font(self, base_font="Helvetica"):
+        # Returns the resource name (ex: b'F1') of one of the 14 standard fonts, writing its object on first use
+        if base_font not in self._fonts:
+            obj_id = self._reserve_object()
+            resource_name = b'F%d' % (len(self._fonts) + 1)
+            self._write_object(obj_id, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                               % base_font.encode('ascii'))
+            self._fonts[base_font] = (resource_name, obj_id)
+        return self._fonts[base_font][0]
+
+    def image(self, path):
+        # Writes the image at path as an image XObject and returns (resource name, object number, width, height in pixels).
+        # Baseline RGB and grayscale JPEGs are copied as they are (PDF readers decode JPEG themselves); anything else
+        # is decoded and Flate compressed a strip of rows at a time.
+        from .images import convert_mode, open_image
+        obj_id = self._reserve_object()
+        self._image_count += 1
+        resource_name = b'Im%d' % self._image_count
+        with open_image(path) as img:  # Only the header is read here
+            width, height = img.size
+            header = b' /Type /XObject /Subtype /Image /Width %d /Height %d /BitsPerComponent 8' % (width, height)
+            if img.format == 'JPEG' and img.mode in JPEG_COLOR_SPACES:
+                self._write_stream_chunks(obj_id, _read_chunks(path),
+                                          header + b' /ColorSpace %s /Filter /DCTDecode' % JPEG_COLOR_SPACES[img.mode])
+                return resource_name, obj_id, width, height
+
+            img.load()
+            mode = 'L' if img.mode in ('1', 'L', 'I;16', 'I', 'F') else 'RGB'
+            img = convert_mode(img, mode)  # Transparency is flattened onto white
+            compressor = zlib.compressobj()
+
+            def strips():
+                for top in range(0, height, IMAGE_STRIP_HEIGHT):
+                    yield compressor.compress(img.crop((0, top, width, min(top + IMAGE_STRIP_HEIGHT, height))).tobytes())
+                yield compressor.flush()
+
+            color_space = b'/DeviceGray' if mode == 'L' else b'/DeviceRGB'
+            self._write_stream_chunks(obj_id, strips(), header + b' /ColorSpace %s /Filter /FlateDecode' % color_space)
+        return resource_name, obj_id, width, height
+
+    def add_page(self, content, pagesize=None, images=()):
+        # Writes one page whose content stream is `content` (raw PDF drawing operators).
+        # images lists the (resource name, object number) pairs of the image XObjects the page draws.
+        width, height = pagesize or self.pagesize
+        content_id = self._reserve_object()
+        self._write_stream(content_id, content)
+        fonts = b' '.join(b'/%s %d 0 R' % (name, obj_id) for name, obj_id in self._fonts.values())
+        xobjects = b' '.join(b'/%s %d 0 R' % (name, obj_id) for name, obj_id in images)
+        if len(self._page_ids) % PAGE_GROUP_SIZE == 0:
+            self._group_ids.append(self._reserve_object())
+        page_id = self._reserve_object()
+        self._write_object(page_id, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Contents %d 0 R '
+                                    b'/Resources << /Font << %s >> /XObject << %s >> >> >>'
+                           % (self._group_ids[-1], pdf_number(width), pdf_number(height), content_id, fonts, xobjects))
+        self._page_ids.append(page_id)
+        return page_id
+
+    def close(self):
+        if self._file.closed:
+            return
+        if not self._page_ids:  # A PDF needs at least one page, even for an empty input
+            self.add_page(b'')
+        # Two-level page tree: the root lists the groups, each group lists up to PAGE_GROUP_SIZE pages
+        for index, group_id in enumerate(self._group_ids):
+            pages = self._page_ids[index * PAGE_GROUP_SIZE:(index + 1) * PAGE_GROUP_SIZE]
+            kids = b' '.join(b'%d 0 R' % page_id for page_id in pages)
+            self._write_object(group_id, b'<< /Type /Pages /Parent %d 0 R /Kids [%s] /Count %d >>'
+                               % (self._pages_id, kids, len(pages)))
+        groups = b' '.join(b'%d 0 R' % group_id for group_id in self._group_ids)
+        self._write_object(self._pages_id, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (groups, len(self._page_ids)))
+        catalog_id = self._reserve_object()
+        self._write_object(catalog_id, b'<< /Type /Catalog /Pages %d 0 R >>' % self._pages_id)
+
+        # Cross-reference table and trailer
+        xref_offset = self._file.tell()
+        self._file.write(b'xref\n0 %d\n0000000000 65535 f \n' % len(self._offsets))
+        for offset in self._offsets[1:]:
+            self._file.write(b'%010d 00000 n \n' % offset)
+        self._file.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                         % (len(self._offsets), catalog_id, xref_offset))
+        self._file.close()
+
+
+def _read_chunks(path, chunk_size=COPY_CHUNK_SIZE):
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def pdf_number(value):
+    # PDF numbers without a trailing ".0" for whole values
+    return (b'%d' % value) if float(value).is_integer() else (b'%.2f' % value)
@@ -0,0 +1,174 @@
+import heapq
+import importlib.util
+import shutil
+
+
+def normalize_extension(extension):
+    # Accepts "pdf", ".pdf" or ".PDF" and always returns ".pdf"
+    extension = extension.strip().lower()
+    if extension and not extension.startswith('.'):
+        extension = '.' + extension
+    return extension
+
+
+def module_available(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):  # A parent package that is missing or broken
+        return False
+
+
+class Converter:
+    # One conversion step: any of `sources` to any of `targets` at a relative `cost` (roughly, how slow/lossy it is).
+    # Bump `version` whenever the converter's output changes so cached outputs from older versions are not reused.
+    # `requires` lists the modules the func imports; a tuple in it means any one of those modules will do.
+    # `tools` lists the executables it runs, which must be on the PATH.
+    # A `direct_only` converter is only used as the single step from a file that really is in its source format,
+    # never after other converters (ex: PDF --> image keeps one page, so TXT --> PDF --> PNG would drop the rest).
+    # `target_options(target, options)` narrows the options down to those that matter for a target, when some only
+    # apply to some of the targets (ex: JPEG quality).
+    def __init__(self, name, func, sources, targets, cost=1, version=1, takes_target=False, options=(), requires=(),
+                 direct_only=False, tools=(), target_options=None):
+        self.name = name
+        self.func = func
+        self.batch_func = None  # Optional, converts a list of (source, output) pairs in one go, see register_batch
+        self.sources = frozenset(normalize_extension(ext) for ext in sources)
+        self.targets = frozenset(normalize_extension(ext) for ext in targets)
+        self.cost = cost
+        self.version = version
+        self.takes_target = takes_target  # The func needs to know which of its targets to write
+        self.options = frozenset(options)  # Keyword arguments the func accepts, picked out of the caller's options
+        self.requires = tuple(requirement if isinstance(requirement, tuple) else (requirement,) for requirement in requires)
+        self.tools = tuple(tools)
+        self.target_options = target_options
+        self._missing = None
+        self.direct_only = direct_only
+
+    def __repr__(self):
+        return f"Converter({self.name!r})"
+
+    def missing_requirements(self):
+        # The requirements that can't be imported here, looked up (without importing anything) the first time only
+        if self._missing is None:
+            self._missing = [' or '.join(modules) for modules in self.requires
+                             if not any(module_available(module) for module in modules)]
+            self._missing += [tool for tool in self.tools if shutil.which(tool) is None]
+        return self._missing
+
+    @property
+    def available(self):
+        return not self.missing_requirements()
+
+    def own_options(self, options):
+        return {name: value for name, value in (options or {}).items() if name in self.options and value is not None}
+
+    def applied_options(self, options, target_extension):
+        # The options that change what the func writes for target_extension (see cache keys and same-format re-encodes)
+        options = self.own_options(options)
+        if self.target_options is not None:
+            options = self.target_options(target_extension, options)
+        return options
+
+    def run(self, source_path, output_path, target_extension, options=None):
+        if self.takes_target:
+            return self.func(source_path, output_path, target_extension, **self.own_options(options))
+        return self.func(source_path, output_path, **self.own_options(options))
+
+    def run_batch(self, jobs, target_extension, options=None):
+        # jobs is a list of (source_path, output_path) pairs
+        if self.batch_func is None:
+            for source_path, output_path in jobs:
+                self.run(source_path, output_path, target_extension, options)
+        elif self.takes_target:
+            return self.batch_func(jobs, target_extension, **self.own_options(options))
+        else:
+            return self.batch_func(jobs, **self.own_options(options))
+
+
+class ConverterRegistry:
+    # Converters indexed by source extension. Together they form a graph of formats, and find_route picks the
+    # cheapest chain of converters between two formats (ex: DOCX --> TXT --> PDF when there is no direct converter).
+
+    def __init__(self):
+        self._converters = {}  # name -> Converter
+        self._by_source = {}  # source extension -> [Converter]
+        self._routes = {}  # (source, target, available_only) -> route, cleared whenever a converter is registered
+
+    def register(self, name, sources, targets, cost=1, version=1, takes_target=False, options=(), requires=(),
+                 direct_only=False, tools=(), target_options=None):
+        # Decorator: @registry.register('txt_to_docx', ['.txt'], ['.docx'])
+        def decorator(func):
+            self.add(Converter(name, func, sources, targets, cost, version, takes_target, options, requires,
+                               direct_only, tools, target_options))
+            return func
+        return decorator
+
+    def register_batch(self, name):
+        # Decorator: attaches a batch implementation to an already registered converter. Batches pay a converter's
+        # startup cost (ex: launching Word) once instead of once per file.
+        def decorator(func):
+            self._converters[name].batch_func = func
+            return func
+        return decorator
+
+    def add(self, converter):
+        if converter.name in self._converters:
+            raise ValueError(f"A converter named {converter.name} is already registered")
+        self._converters[converter.name] = converter
+        for source in converter.sources:
+            self._by_source.setdefault(source, []).append(converter)
+        self._routes.clear()
+
+    def get(self, name):
+        return self._converters[name]
+
+    def __iter__(self):
+        return iter(self._converters.values())
+
+    def source_formats(self):
+        return set(self._by_source)
+
+    def target_formats(self):
+        return {target for converter in self._converters.values() for target in converter.targets}
+
+    def direct_converter(self, source_extension, target_extension):
+        # The cheapest single converter from source to target, which may be the same format (to re-encode it)
+        target_extension = normalize_extension(target_extension)
+        candidates = [converter for converter in self._by_source.get(normalize_extension(source_extension), ())
+                      if target_extension in converter.targets and converter.available]
+        return min(candidates, key=lambda converter: converter.cost, default=None)
+
+    def find_route(self, source_extension, target_extension, available_only=True):
+        # Returns the cheapest list of (Converter, output extension) steps, or None if the target can't be reached.
+        # Converters whose requirements are not installed are left out (ex: DOCX --> PDF goes through TXT when
+        # docx2pdf is missing) unless available_only is False.
+        source_extension = normalize_extension(source_extension)
+        target_extension = normalize_extension(target_extension)
+        key = (source_extension, target_extension, available_only)
+        if key not in self._routes:
+            self._routes[key] = self._cheapest_route(source_extension, target_extension, available_only)
+        return self._routes[key]
+
+    def _cheapest_route(self, source_extension, target_extension, available_only=True):
+        # Dijkstra over formats; the counter keeps heap entries comparable when costs tie
+        counter = 0
+        queue = [(0, counter, source_extension, [])]
+        best = {source_extension: 0}
+        while queue:
+            cost, _, extension, route = heapq.heappop(queue)
+            if extension == target_extension:
+                return route
+            if cost > best.get(extension, float('inf')):
+                continue
+            for converter in self._by_source.get(extension, ()):
+                if (available_only and not converter.available) or (converter.direct_only and route):
+                    continue
+                for target in converter.targets:
+                    if target == extension:
+                        continue
+                    new_cost = cost + converter.cost
+                    if new_cost < best.get(target, float('inf')):
+                        best[target] = new_cost
+                        counter += 1
+                        heapq.heappush(queue, (new_cost, counter, target, route + [(converter, target)]))
+        return None
@@ -0,0 +1,362 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, wait
+
+from . import events
+from .engine import (ConversionError, ConversionSkipped, convert_batch, convert_file, normalize_extension, output_path_for,
+                     plan_batches, source_format)
+from .media import MEDIA_EXTENSIONS
+
+# Statuses reported for every file of a batch
+CONVERTED = "converted"
+SKIPPED = "skipped"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# The event emitted for each final status
+STATUS_EVENTS = {CONVERTED: events.FINISHED, SKIPPED: events.SKIPPED, FAILED: events.FAILED, CANCELLED: events.CANCELLED}
+
+# Address space a worker already uses for the interpreter and converter libraries, on top of its memory budget
+WORKER_BASE_MEMORY = 512 * 1024 * 1024
+
+
+def limit_worker_memory(memory_budget):
+    # Caps the worker's address space so one huge file fails with a MemoryError in that worker
+    # instead of pushing the whole host into swap. Only available on Unix, elsewhere only the per-file checks apply.
+    # Only the soft limit is lowered, so converters that start other programs (ex: ffmpeg, see
+    # media.child_memory_limit_lifted) can raise it back for them.
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = memory_budget + WORKER_BASE_MEMORY
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def init_worker(memory_budget, progress_queue):
+    # Pool initializer: applies the memory limit and sends the worker's progress reports to the dispatcher
+    if memory_budget:
+        limit_worker_memory(memory_budget)
+    events.set_progress_sink(progress_queue.put)
+
+
+def default_worker_count():
+    return max(1, (os.cpu_count() or 1) - 1)  # Leave a core free for the UI / the rest of the host
+
+
+class FileResult:
+    def __init__(self, file, status, output_file=None, message="", timings=None, bytes_in=None, bytes_out=None):
+        self.file = file
+        self.status = status
+        self.output_file = output_file
+        self.message = message
+        self.timings = timings or {}
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.peak_rss_mb = None
+        self.pid = None
+        self.started_at = None  # When a worker picked the file up
+
+    def measured(self):
+        # Stamps the worker's pid and peak memory onto the result before it is sent back to the dispatcher
+        self.pid = os.getpid()
+        self.peak_rss_mb = events.peak_rss_mb()
+        return self
+
+    def to_event(self):
+        return events.Event(STATUS_EVENTS[self.status], self.file, self.output_file, self.message, self.timings,
+                            self.bytes_in, self.bytes_out, self.peak_rss_mb, self.pid)
+
+    def __repr__(self):
+        return f"FileResult({self.file!r}, {self.status!r})"
+
+
+def convert_one(file, conversion_extension, output_dir=None, cache=None, options=None):
+    # Runs inside a worker process, so it must never raise (exceptions from some libraries don't pickle)
+    started_at = time.time()
+    events.report_started(file)
+    with events.record_stages() as timings, events.reporting_progress(file):
+        try:
+            output_file = convert_file(file, conversion_extension, output_dir, cache, options)
+        except ConversionSkipped as e:
+            result = FileResult(file, SKIPPED, message=str(e))
+        except ConversionError as e:
+            result = FileResult(file, FAILED, message=str(e))
+        except MemoryError:
+            result = FileResult(file, FAILED, message=f"Failed to convert {file}: ran out of memory")
+        except Exception as e:
+            result = FileResult(file, FAILED, message=f"Failed to convert {file}: {e}")
+        else:
+            result = FileResult(file, CONVERTED, output_file, f"Successfully converted {file} to {output_file}",
+                                bytes_in=events.file_size(file), bytes_out=events.file_size(output_file))
+    result.timings = timings
+    result.started_at = started_at
+    return result.measured()
+
+
+def convert_many(files, conversion_extension, output_dir=None, cache=None, options=None):
+    # Worker side of a batch planned by engine.plan_batches, returns one FileResult per file.
+    # The files are converted in one call, so each file is credited with an equal share of the batch's stage times.
+    started_at = time.time()
+    for file in files:
+        events.report_started(file)
+    with events.record_stages() as timings:
+        try:
+            converted = convert_batch(files, conversion_extension, output_dir, cache, options)
+        except Exception as e:
+            converted = [(file, None, f"Failed to convert {file}: {e}") for file in files]
+    share = {stage: seconds / len(files) for stage, seconds in timings.items()}
+    results = [FileResult(file, FAILED, message=error, timings=share) if error else
+               FileResult(file, CONVERTED, output_file, f"Successfully converted {file} to {output_file}", share,
+                          events.file_size(file), events.file_size(output_file))
+               for file, output_file, error in converted]
+    for result in results:
+        result.started_at = started_at
+    return [result.measured() for result in results]
+
+
+def output_dirs_by_file(files, output_dir=None):
+    # {file: output directory} in the order given, see BatchScheduler.start
+    return dict(entry if isinstance(entry, tuple) else (entry, output_dir) for entry in files)
+
+
+def claim_output_paths(output_dirs, conversion_extension):
+    # Returns {file: message} for the files whose output path an earlier file of the batch already claimed
+    # (ex: a/x.txt and b/x.txt, or x.txt and x.csv, into one output directory), which would overwrite its output
+    conversion_extension = normalize_extension(conversion_extension)
+    claimed = {}
+    collisions = {}
+    for file, output_dir in output_dirs.items():
+        output_file = output_path_for(file, conversion_extension, output_dir)
+        key = os.path.normcase(os.path.abspath(output_file))
+        if key in claimed:
+            collisions[file] = (f"Failed to convert {file}: its output {output_file} would overwrite the output of "
+                                f"{claimed[key]}")
+        else:
+            claimed[key] = file
+    return collisions
+
+
+def is_media_job(file, conversion_extension):
+    # Video / audio conversions, which run several ffmpeg processes of their own (see media.transcode_media)
+    if normalize_extension(conversion_extension) not in MEDIA_EXTENSIONS:
+        return False
+    try:
+        return source_format(file) in MEDIA_EXTENSIONS
+    except ConversionError:
+        return False
+
+
+def split_by_output_dir(batch, output_dirs):
+    # A batch goes to a single worker call with one output directory, so files bound elsewhere get their own batch
+    groups = {}
+    for file in batch:
+        groups.setdefault(output_dirs[file], []).append(file)
+    return groups.values()
+
+
+class BatchScheduler:
+    # Converts a batch of files on a pool of worker processes.
+    # Per-file FileResults are pushed onto self.results (a thread-safe queue), so the UI can poll it with root.after
+    # while the batch runs in the background. The dispatcher only keeps a few jobs in flight per worker, which keeps
+    # memory flat for huge batches and lets cancel() take effect quickly. Files whose converter has a batch
+    # implementation (ex: DOCX --> PDF) are sent to a worker together, see engine.plan_batches.
+    # With keep_pool the worker processes outlive a batch and are reused by the next one (ex: the watcher, which
+    # runs a small batch per poll) until close() is called.
+
+    def __init__(self, workers=None, convert=convert_one, cache=None, convert_group=convert_many, memory_budget=None,
+                 observers=(), keep_pool=False):
+        self.workers = max(1, workers or default_worker_count())
+        self.convert = convert
+        self.convert_group = convert_group
+        self.cache = cache  # Optional ConversionCache shared by every worker
+        self.memory_budget = memory_budget  # Optional bytes per worker, so workers x budget bounds the whole batch
+        self.observers = list(observers)  # Callables receiving every events.Event of the batch
+        self.keep_pool = keep_pool
+        self.results = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+        self._done_event.set()  # Nothing is running yet
+        self._thread = None
+        self._started = set()  # Files of the running batch whose STARTED event was emitted
+        self._started_lock = threading.Lock()
+        self._pool = None
+        self._pool_broken = False
+        self._progress_queue = None
+        self._progress_thread = None
+
+    def start(self, files, conversion_extension, output_dir=None, options=None):
+        # files may mix paths (written to output_dir) and (path, output directory) pairs
+        if self.is_running():
+            raise RuntimeError("A batch is already running")
+        output_dirs = output_dirs_by_file(files, output_dir)
+        options = dict(options or {})
+        if self.memory_budget:
+            options.setdefault('memory_budget', self.memory_budget)  # Lets converters refuse a file before decoding it
+        self._cancel_event.clear()
+        self._done_event.clear()
+        self._thread = threading.Thread(target=self._dispatch, args=(output_dirs, conversion_extension, options),
+                                        daemon=True)
+        self._thread.start()
+
+    def subscribe(self, observer):
+        self.observers.append(observer)
+
+    def emit(self, event):
+        for observer in self.observers:
+            try:
+                observer(event)
+            except Exception as e:  # A broken observer must not stop the batch
+                print(f"WARNING: Event observer {observer!r} failed: {e}")
+
+    def cancel(self):
+        # Files that have not started yet are reported as CANCELLED, files already converting are allowed to finish
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_running(self):
+        return not self._done_event.is_set()
+
+    def wait(self, timeout=None):
+        return self._done_event.wait(timeout)
+
+    def drain(self):
+        # Returns every result that is currently waiting in the queue without blocking
+        drained = []
+        while True:
+            try:
+                drained.append(self.results.get_nowait())
+            except queue.Empty:
+                return drained
+
+    def run(self, files, conversion_extension, output_dir=None, options=None):
+        # Blocking helper for headless callers: yields results as they complete
+        self.start(files, conversion_extension, output_dir, options)
+        while True:
+            try:
+                yield self.results.get(timeout=0.1)
+            except queue.Empty:
+                if not self.is_running() and self.results.empty():
+                    return
+
+    def close(self):
+        # Shuts the worker processes down (a batch without keep_pool does this itself when it is done)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._progress_thread is not None:
+            self._progress_queue.put(None)
+            self._progress_thread.join()
+            self._progress_queue.close()
+            self._progress_thread = self._progress_queue = None
+
+    def _open_pool(self):
+        if self._pool_broken:  # A worker died and took the pool down with it, start over with fresh workers
+            self.close()
+            self._pool_broken = False
+        if self._pool is None:
+            self._progress_queue = multiprocessing.Queue()
+            self._progress_thread = threading.Thread(target=self._forward_progress, args=(self._progress_queue,),
+                                                     daemon=True)
+            self._progress_thread.start()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                             initargs=(self.memory_budget, self._progress_queue))
+        return self._pool
+
+    def _dispatch(self, output_dirs, conversion_extension, options):
+        collisions = claim_output_paths(output_dirs, conversion_extension)
+        convertible = [file for file in output_dirs if file not in collisions]
+        pending = (job for batch in plan_batches(convertible, conversion_extension)
+                   for job in split_by_output_dir(batch, output_dirs))
+        in_flight = {}
+        max_in_flight = self.workers * 2
+        # Media jobs get a share of the cores for their segments: the cores split between the media jobs that can
+        # run at once, those in flight plus those still to come (up to one per worker). Set per job when it is
+        # submitted, unless the caller picked segment_workers.
+        media = set() if options.get('segment_workers') else {file for file in convertible
+                                                               if is_media_job(file, conversion_extension)}
+        media_to_submit = len(media)
+        self._started = set()
+        for file in output_dirs:
+            self.emit(events.Event(events.QUEUED, file))
+        for file, message in collisions.items():
+            self._put(FileResult(file, FAILED, message=message))
+        try:
+            pool = self._open_pool()
+            for job in pending:
+                if self._cancel_event.is_set():
+                    self._put_cancelled(job)
+                    break
+                output_dir = output_dirs[job[0]]
+                job_options = options
+                if job[0] in media:
+                    media_in_flight = sum(1 for other in in_flight.values() if other[0] in media)
+                    busy = max(1, min(self.workers, media_in_flight + media_to_submit))
+                    job_options = dict(options, segment_workers=max(1, (os.cpu_count() or 1) // busy))
+                    media_to_submit -= 1
+                if len(job) == 1:
+                    future = pool.submit(self.convert, job[0], conversion_extension, output_dir, self.cache,
+                                         job_options)
+                else:
+                    future = pool.submit(self.convert_group, job, conversion_extension, output_dir, self.cache,
+                                         options)
+                in_flight[future] = job
+                if len(in_flight) >= max_in_flight:
+                    self._collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done)
+            self._collect(in_flight, wait(in_flight).done)
+            for job in pending:  # Only left over if the batch was cancelled
+                self._put_cancelled(job)
+        finally:
+            if not self.keep_pool:
+                self.close()
+            self._done_event.set()
+
+    def _forward_progress(self, progress_queue):
+        # Emits the STARTED and PROGRESS events workers send (see events.report_started) until _dispatch is done
+        while True:
+            report = progress_queue.get()
+            if report is None:
+                return
+            kind, file, progress, pid, timestamp = report
+            if kind == events.STARTED:
+                self._emit_started(file, pid, timestamp)
+            else:
+                self.emit(events.Event(kind, file, progress=progress, pid=pid, timestamp=timestamp))
+
+    def _emit_started(self, file, pid, timestamp):
+        # Called by whichever comes first: the worker's report, or its result (reports travel on their own queue,
+        # so a quick file's result can overtake it). Both carry the time the worker picked the file up.
+        with self._started_lock:
+            if file in self._started:
+                return
+            self._started.add(file)
+        self.emit(events.Event(events.STARTED, file, pid=pid, timestamp=timestamp))
+
+    def _put_cancelled(self, job):
+        for file in job:
+            self._put(FileResult(file, CANCELLED, message=f"{file} was not converted (cancelled)"))
+
+    def _put(self, result):
+        if result.started_at is not None:
+            self._emit_started(result.file, result.pid, result.started_at)
+        self.emit(result.to_event())
+        self.results.put(result)
+
+    def _collect(self, in_flight, done):
+        for future in done:
+            job = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:  # The worker process itself died (ex: out of memory)
+                self._pool_broken = self._pool_broken or isinstance(e, BrokenExecutor)
+                result = [FileResult(file, FAILED, message=f"Failed to convert {file}: {e}") for file in job]
+            for file_result in (result if isinstance(result, list) else [result]):
+                self._put(file_result)
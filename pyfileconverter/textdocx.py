@@ -0,0 +1,60 @@
+from .docxwriter import StreamingDocxWriter
+from .events import stage
+from .formats import text_encoding_of
+from .textpdf import FORM_FEED, READ_CHUNK_SIZE, iter_text_lines
+
+# Streaming TXT --> DOCX.
+# Lines are read in chunks (see textpdf.iter_text_lines) and their paragraphs are written straight into the zipped
+# word/document.xml, so a 500 MB log needs no more memory than a short note. Every character is kept except the
+# few XML can't hold; tabs stay tabs and form feeds become page breaks.
+
+PARAGRAPH_MODES = ('lines', 'blocks')
+MAX_BLOCK_LINES = 1000  # A "blocks" paragraph is cut after this many lines so a file without blank lines stays bounded
+WRITE_PARAGRAPHS = 10_000  # Paragraphs handed to the writer at a time
+
+
+def text_file_to_docx(text_file_path, output_docx_path, paragraphs='lines', encoding=None,
+                      chunk_size=READ_CHUNK_SIZE):
+    # paragraphs 'lines' makes every line a paragraph, 'blocks' makes every run of lines between blank lines one
+    # paragraph (its lines kept apart by line breaks), which suits prose wrapped at a fixed width.
+    # encoding None reads the file in the encoding detected from its first bytes (UTF-8, UTF-16, cp1252, ...)
+    if paragraphs not in PARAGRAPH_MODES:
+        raise ValueError(f"paragraphs must be one of {', '.join(PARAGRAPH_MODES)}, not {paragraphs!r}")
+    encoding = encoding or text_encoding_of(text_file_path)
+    with open(text_file_path, 'r', encoding=encoding, errors='replace') as file, \
+            StreamingDocxWriter(output_docx_path) as docx:
+        pending = []  # Paragraphs not handed to the writer yet
+        block = []  # Lines of the current "blocks" paragraph
+
+        def end_block():
+            if block:
+                pending.append('\n'.join(block))
+                block.clear()
+
+        def flush():
+            with stage('encode'):
+                docx.paragraphs(pending)
+            pending.clear()
+
+        for line in iter_text_lines(file, chunk_size):
+            segments = line.split(FORM_FEED) if FORM_FEED in line else (line,)  # Form feeds start a new page
+            for segment_index, segment in enumerate(segments):
+                if segment_index:
+                    end_block()
+                    flush()
+                    docx.page_break()
+                if not segment and len(segments) > 1:  # Nothing but the page break itself
+                    continue
+                if paragraphs == 'lines':
+                    pending.append(segment)
+                elif segment.strip():
+                    block.append(segment)
+                    if len(block) >= MAX_BLOCK_LINES:
+                        end_block()
+                else:
+                    end_block()
+            if len(pending) >= WRITE_PARAGRAPHS:
+                flush()
+        end_block()
+        flush()
+    return docx.paragraph_count
@@ -0,0 +1,155 @@
+import bisect
+import itertools
+import re
+
+from .events import stage
+from .formats import text_encoding_of
+from .pdfwriter import LETTER, StreamingPdfWriter, pdf_string
+
+# Streaming TXT --> PDF.
+# The input is read in fixed-size chunks and every page is written out as soon as it is full,
+# so memory use is the same for a 10 KB note and a multi-GB log file.
+
+READ_CHUNK_SIZE = 1 << 20  # 1 MB of text per read
+FORM_FEED = '\x0c'
+# Control characters the standard fonts can't draw (tabs and form feeds are handled separately)
+CONTROL_CHARACTERS = re.compile('[\x00-\x08\x0a\x0b\x0d-\x1f]')
+
+
+def iter_text_lines(file, chunk_size=READ_CHUNK_SIZE):
+    # Yields the lines of an open text file without their line endings, reading at most chunk_size characters at
+    # a time. A line that never ends is yielded in chunk_size pieces so a file without newlines can't fill memory.
+    carry = ''
+    while True:
+        with stage('decode'):
+            chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        lines = (carry + chunk).split('\n')
+        carry = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+        while len(carry) > chunk_size:
+            yield carry[:chunk_size]
+            carry = carry[chunk_size:]
+    if carry:
+        yield carry.rstrip('\r')
+
+
+class FontMeasure:
+    # Measures strings with the font's metrics, caching the width of every character seen so far
+    def __init__(self, font_name, font_size):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        self._string_width = stringWidth
+        self.font_name = font_name
+        self.font_size = font_size
+        self._widths = {}
+
+    def char_width(self, char):
+        width = self._widths.get(char)
+        if width is None:
+            width = self._widths[char] = self._string_width(char, self.font_name, self.font_size)
+        return width
+
+    def width(self, text):
+        try:
+            return sum(map(self._widths.__getitem__, text))  # Fast path once every character has been seen
+        except KeyError:
+            return sum(self.char_width(char) for char in text)
+
+    def fit(self, text, max_width):
+        # Returns how many characters from the start of text fit within max_width
+        self.width(text)  # Caches the width of every character
+        return bisect.bisect_right(list(itertools.accumulate(map(self._widths.__getitem__, text))), max_width)
+
+
+def wrap_line(line, max_width, measure):
+    # Splits a line into pieces that fit within max_width, breaking between words where possible
+    if measure.width(line) <= max_width:  # Most lines fit, so only the long ones get split up
+        return [line]
+    space_width = measure.char_width(' ')
+    pieces = []
+    current = []
+    current_width = 0.0
+    for word in line.split(' '):
+        word_width = measure.width(word)
+        if word_width > max_width:  # Too long for any line, so break it wherever it runs out of room
+            if current:
+                pieces.append(' '.join(current))
+            start = 0
+            width = 0.0
+            for index, char in enumerate(word):
+                char_width = measure.char_width(char)
+                if width + char_width > max_width and index > start:
+                    pieces.append(word[start:index])
+                    start = index
+                    width = 0.0
+                width += char_width
+            current = [word[start:]]
+            current_width = width
+        elif current and current_width + space_width + word_width > max_width:
+            pieces.append(' '.join(current))
+            current = [word]
+            current_width = word_width
+        else:
+            current_width += (space_width if current else 0) + word_width
+            current.append(word)
+    pieces.append(' '.join(current))
+    return pieces
+
+
+def clean_line(line, tab_size=4):
+    # Maps the line onto characters the WinAnsi encoded standard fonts can draw
+    if line.isascii() and line.isprintable():  # Nothing to do for most lines
+        return line
+    line = CONTROL_CHARACTERS.sub(' ', line.expandtabs(tab_size))
+    return line.encode('cp1252', 'replace').decode('cp1252', 'replace')
+
+
+def write_text_pages(pdf, text_file_path, font_name="Helvetica", font_size=12, margin=72, pagesize=LETTER,
+                     encoding=None, chunk_size=READ_CHUNK_SIZE):
+    # Lays out a text file onto new pages of an open StreamingPdfWriter and returns how many pages it added.
+    # encoding None reads the file in the encoding detected from its first bytes (UTF-8, UTF-16, cp1252, ...)
+    width, height = pagesize
+    line_height = font_size * 1.2  # line height (can be adjusted)
+    max_lines_per_page = max(1, int((height - 2 * margin) / line_height))
+    max_line_width = width - 2 * margin
+    measure = FontMeasure(font_name, font_size)
+    first_page = pdf.page_count
+
+    encoding = encoding or text_encoding_of(text_file_path)
+    with open(text_file_path, 'r', encoding=encoding, errors='replace') as file:
+        font = pdf.font(font_name)
+        page_lines = []
+
+        def flush_page():
+            # Each page is one text object: set the font and leading once, then move down a line per T*
+            content = [b'BT /%s %.2f Tf %.2f TL %.2f %.2f Td' % (font, font_size, line_height, margin, height - margin)]
+            for index, page_line in enumerate(page_lines):
+                content.append((b'T* ' if index else b'') + pdf_string(page_line) + b' Tj')
+            content.append(b'ET')
+            with stage('encode'):
+                pdf.add_page(b'\n'.join(content), pagesize)
+            page_lines.clear()
+
+        for line in iter_text_lines(file, chunk_size):
+            segments = line.split(FORM_FEED)  # Form feeds start a new page
+            for segment_index, segment in enumerate(segments):
+                if segment_index and page_lines:
+                    flush_page()
+                if not segment and len(segments) > 1:  # Nothing but the page break itself
+                    continue
+                for piece in wrap_line(clean_line(segment), max_line_width, measure):
+                    page_lines.append(piece)
+                    if len(page_lines) >= max_lines_per_page:
+                        flush_page()
+        if page_lines or pdf.page_count == first_page:  # An empty file still gets its (blank) page
+            flush_page()
+    return pdf.page_count - first_page
+
+
+def text_file_to_pdf(text_file_path, output_pdf_path, font_name="Helvetica", font_size=12, margin=72,
+                     pagesize=LETTER, encoding=None, chunk_size=READ_CHUNK_SIZE):
+    with StreamingPdfWriter(output_pdf_path, pagesize) as pdf:
+        write_text_pages(pdf, text_file_path, font_name, font_size, margin, pagesize, encoding, chunk_size)
+    return pdf.page_count
@@ -0,0 +1,238 @@
+import os
+import queue
+import sqlite3
+import time
+
+from .engine import ConversionError, normalize_extension, registry, source_format
+from .formats import same_format
+from .scheduler import FAILED, SKIPPED, BatchScheduler
+
+# Watch-folder daemon.
+# New or modified files in the inbox are converted into the output directory (keeping the inbox's subfolders).
+# Changes come from inotify & co. through the optional `watchdog` package; without it the inbox is polled, but only
+# directories whose mtime changed are listed again, so a quiet tree of 100k files costs one stat per directory.
+# A file is only converted once its size and mtime have stopped changing for `settle_seconds` (so half-copied files
+# are left alone), and a manifest remembers what was converted so restarts don't redo any work.
+
+IGNORED_SUFFIXES = ('~', '.tmp', '.part', '.crdownload', '.partial')
+
+
+def is_ignored(name):
+    return name.startswith('.') or name.lower().endswith(IGNORED_SUFFIXES)
+
+
+class Manifest:
+    # sqlite record of every file that was handled, keyed by path and checked against its size and mtime
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Only used by the watcher's own loop, but that loop may run on another thread than the one that built it
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+                        'mtime_ns INTEGER NOT NULL, status TEXT NOT NULL, output TEXT, message TEXT, '
+                        'handled_at REAL NOT NULL)')
+
+    def is_current(self, path, stat):
+        row = self.db.execute('SELECT size, mtime_ns FROM files WHERE path = ?', (path,)).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns
+
+    def record(self, path, stat, status, output=None, message=""):
+        # Failures are recorded too, so a broken file is only retried once it changes
+        self.db.execute('INSERT OR REPLACE INTO files (path, size, mtime_ns, status, output, message, handled_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (path, stat.st_size, stat.st_mtime_ns, status, output, message, time.time()))
+
+    def close(self):
+        self.db.close()
+
+
+class FolderWatcher:
+    def __init__(self, inbox, output_dir, conversion_extension, manifest_path=None, settle_seconds=2.0,
+                 poll_interval=2.0, full_scan_interval=600.0, workers=None, cache=None, options=None, observers=(),
+                 use_native_events=True):
+        self.inbox = os.path.abspath(inbox)
+        self.output_dir = os.path.abspath(output_dir)
+        self.conversion_extension = normalize_extension(conversion_extension)
+        self.manifest = Manifest(manifest_path or os.path.join(self.output_dir, '.pyfileconverter-manifest.sqlite3'))
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.full_scan_interval = full_scan_interval  # Safety net for changes the fast checks can't see
+        self.options = options
+        self.scheduler = BatchScheduler(workers=workers, cache=cache, observers=observers, keep_pool=True)
+        self.use_native_events = use_native_events
+
+        self._dir_mtimes = {}  # Directory -> mtime_ns when it was last listed
+        self._subdirs = {}  # Directory -> its subdirectories when it was last listed
+        self._pending = {}  # File -> (size, mtime_ns, time it was first seen with that size and mtime)
+        self._changed = queue.Queue()  # Paths reported by the native observer thread
+        self._observer = None
+        self._running = False
+
+    def wants(self, path):
+        # Whether a settled file gets converted, decided from its content like the convert command does (a .log full
+        # of text converts, a PNG named .jpg is not taken for a JPEG). Files that are already in the target format or
+        # have no route are left alone. Files whose content contradicts their name are handed to the scheduler,
+        # which reports them as failed.
+        if is_ignored(os.path.basename(path)):
+            return False
+        try:
+            extension = source_format(path)  # Cached per path, size and mtime (see formats.FormatIndex)
+        except ConversionError:
+            return True
+        if same_format(extension, self.conversion_extension):  # Ex: JPEGs (named .jpg or not) when converting to .jpeg
+            return False
+        return bool(registry.find_route(extension, self.conversion_extension))
+
+    def start_native_events(self):
+        # Uses watchdog (inotify / FSEvents / ReadDirectoryChangesW) when it is installed, returns False otherwise
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        changed = self._changed
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    changed.put(getattr(event, 'dest_path', None) or event.src_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.inbox, recursive=True)
+        self._observer.start()
+        return True
+
+    def scan(self, full=False):
+        # Stats every known directory and only lists the ones that changed since the last scan (all of them if full)
+        pending_dirs = [self.inbox]
+        seen_dirs = set()
+        while pending_dirs:
+            directory = pending_dirs.pop()
+            seen_dirs.add(directory)
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            if full or self._dir_mtimes.get(directory) != mtime:
+                self._list_directory(directory, mtime)
+            pending_dirs.extend(self._subdirs.get(directory, ()))
+        for directory in set(self._dir_mtimes) - seen_dirs:  # Deleted directories
+            self._dir_mtimes.pop(directory, None)
+            self._subdirs.pop(directory, None)
+
+    def _list_directory(self, directory, mtime):
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not is_ignored(entry.name):
+                            subdirs.append(entry.path)
+                    elif not is_ignored(entry.name):
+                        self.consider(entry.path)  # What it is gets checked once it has settled, see convert
+        except OSError as e:
+            print(f"WARNING: Could not read {directory}: {e}")
+            return
+        self._dir_mtimes[directory] = mtime
+        self._subdirs[directory] = subdirs
+
+    def consider(self, path):
+        # Queues a file for conversion unless the manifest says its current version was already handled
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._pending.pop(path, None)
+            return
+        if self.manifest.is_current(path, stat):
+            self._pending.pop(path, None)
+            return
+        previous = self._pending.get(path)
+        if previous is None or previous[:2] != (stat.st_size, stat.st_mtime_ns):
+            self._pending[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def settled_files(self):
+        # Returns the pending files whose size and mtime have not changed for settle_seconds
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:  # Deleted (or moved away) before it settled
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)  # Still being written
+            elif now - since >= self.settle_seconds:
+                ready.append(path)
+        return ready
+
+    def convert(self, files):
+        # Converts the settled files in one batch, each into the output folder that mirrors its inbox folder
+        stats = {}
+        jobs = []
+        for path in files:
+            try:
+                stats[path] = os.stat(path)
+            except OSError:
+                continue
+            if not self.wants(path):  # Recorded, so it is only looked at again once it changes
+                self.manifest.record(path, stats[path], SKIPPED, message=f"{path} is not converted to {self.conversion_extension}")
+                self._pending.pop(path, None)
+                continue
+            relative_dir = os.path.relpath(os.path.dirname(path), self.inbox)
+            output_dir = os.path.normpath(os.path.join(self.output_dir, relative_dir))
+            os.makedirs(output_dir, exist_ok=True)
+            jobs.append((path, output_dir))
+        if not jobs:
+            return
+        for result in self.scheduler.run(jobs, self.conversion_extension, options=self.options):
+            self.manifest.record(result.file, stats[result.file], result.status, result.output_file, result.message)
+            if result.status == FAILED:
+                print(f"ERROR: {result.message}")
+            else:
+                print(result.message)
+            self._pending.pop(result.file, None)
+
+    def run(self, once=False):
+        # Runs until stop() is called (or, with once=True, until everything currently in the inbox is handled)
+        os.makedirs(self.output_dir, exist_ok=True)
+        native = self.use_native_events and not once and self.start_native_events()
+        print(f"Watching {self.inbox} ({'native events' if native else 'polling'}), "
+              f"converting to {self.conversion_extension} in {self.output_dir}")
+        self._running = True
+        self.scan(full=True)
+        last_full_scan = time.monotonic()
+        try:
+            while self._running:
+                if native:
+                    while True:
+                        try:
+                            path = self._changed.get_nowait()
+                        except queue.Empty:
+                            break
+                        if path.startswith(self.inbox + os.sep) and not is_ignored(os.path.basename(path)):
+                            self.consider(path)
+                else:
+                    self.scan()
+                if time.monotonic() - last_full_scan >= self.full_scan_interval:
+                    self.scan(full=True)  # Catches files modified in place, which don't touch their folder's mtime
+                    last_full_scan = time.monotonic()
+
+                ready = self.settled_files()
+                if ready:
+                    self.convert(ready)
+                elif once and not self._pending:
+                    break
+                time.sleep(min(self.poll_interval, self.settle_seconds) if once else self.poll_interval)
+        finally:
+            self.stop()
+            self.scheduler.close()
+            self.manifest.close()
+
+    def stop(self):
+        self._running = False
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
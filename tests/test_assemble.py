@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from pyfileconverter.assemble import assemble_pdf, parse_page_size
+from pyfileconverter.cli import main
+from pyfileconverter.engine import ConversionError
+
+
+def test_parse_page_size():
+    assert parse_page_size('auto') is None
+    assert parse_page_size('A4') == (595.28, 841.89)
+    assert parse_page_size('612x792') == (612.0, 792.0)
+    for value in ('bogus', '0x792', '612x'):
+        with pytest.raises(ValueError, match='Invalid page size'):
+            parse_page_size(value)
+
+
+def test_merge(tmp_path):
+    pytest.importorskip('reportlab')
+    notes = tmp_path / 'notes.txt'
+    notes.write_text('one\ftwo\n')
+    output = tmp_path / 'merged.pdf'
+    assert assemble_pdf([str(notes)], str(output)) == 2
+    assert output.read_bytes().startswith(b'%PDF-')
+    assert sorted(os.listdir(tmp_path)) == ['merged.pdf', 'notes.txt']
+
+
+def test_failed_merge_keeps_the_existing_output(tmp_path):
+    output = tmp_path / 'keep.pdf'
+    output.write_bytes(b'%PDF-1.4 previous merge')
+    with pytest.raises(ConversionError):
+        assemble_pdf([str(tmp_path / 'missing.txt')], str(output))
+    assert output.read_bytes() == b'%PDF-1.4 previous merge'
+    assert os.listdir(tmp_path) == ['keep.pdf']
+
+
+def test_merge_command_keeps_the_existing_output_on_bad_arguments(tmp_path):
+    output = tmp_path / 'keep.pdf'
+    output.write_bytes(b'%PDF-1.4 previous merge')
+    notes = tmp_path / 'notes.txt'
+    notes.write_text('hello\n')
+    assert main(['merge', '-o', str(output), '--page-size', 'bogus', str(notes)]) == 2
+    assert main(['merge', '-o', str(output), str(notes), str(tmp_path / 'missing.txt')]) == 1
+    assert output.read_bytes() == b'%PDF-1.4 previous merge'
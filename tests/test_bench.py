@@ -0,0 +1,21 @@
+import pytest
+
+from pyfileconverter import bench
+
+
+def test_every_pair_has_a_corpus_and_a_warmup_sample():
+    for source, _ in bench.PAIRS:
+        assert source in bench.GENERATORS
+        assert bench.CORPUS_SPECS[source]['warmup'][0] == 1
+        assert set(bench.SIZES) <= set(bench.CORPUS_SPECS[source])
+
+
+def test_warmup_does_not_convert_the_benchmarked_files(tmp_path, monkeypatch):
+    pytest.importorskip('reportlab')
+    converted = []
+    convert_file = bench.convert_file
+    monkeypatch.setattr(bench, 'convert_file', lambda path, *args: converted.append(path) or convert_file(path, *args))
+    paths = bench.build_corpus(str(tmp_path), 'txt', 'small')[:2]
+    [warmup_path] = bench.build_corpus(str(tmp_path), 'txt', 'warmup')
+    bench.run_case(paths, '.pdf', warmup_path)
+    assert converted == [warmup_path] + paths
@@ -0,0 +1,93 @@
+import os
+import types
+
+from pyfileconverter import cache
+from pyfileconverter.cache import ConversionCache, place_file
+
+
+def fake_clock(monkeypatch):
+    # Every call moves the clock forward, so last_used orders entries even on coarse system clocks
+    ticks = iter(range(1, 1000))
+    monkeypatch.setattr(cache, 'time', types.SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def store_output(conversion_cache, tmp_path, name, data):
+    output = tmp_path / name
+    output.write_bytes(data)
+    key = conversion_cache.key_for(str(output), 'test', 1, '.out')
+    conversion_cache.store(key, str(output))
+    return key
+
+
+def test_key_changes_with_content_converter_and_options(tmp_path):
+    conversion_cache = ConversionCache(str(tmp_path / 'cache'))
+    source = tmp_path / 'notes.txt'
+    source.write_text('hello\n')
+    key = conversion_cache.key_for(str(source), 'txt_to_pdf', 1, '.pdf', {'quality': 90})
+    assert conversion_cache.key_for(str(source), 'txt_to_pdf', 1, '.pdf', {'quality': 90}) == key
+    assert conversion_cache.key_for(str(source), 'txt_to_pdf', 2, '.pdf', {'quality': 90}) != key
+    assert conversion_cache.key_for(str(source), 'txt_to_pdf', 1, '.pdf', {'quality': 80}) != key
+    assert conversion_cache.key_for(str(source), 'txt_to_docx', 1, '.pdf', {'quality': 90}) != key
+    source.write_text('hello again\n')
+    assert conversion_cache.key_for(str(source), 'txt_to_pdf', 1, '.pdf', {'quality': 90}) != key
+
+
+def test_fetch_hit_and_miss(tmp_path):
+    conversion_cache = ConversionCache(str(tmp_path / 'cache'))
+    key = store_output(conversion_cache, tmp_path, 'converted.out', b'converted')
+    destination = tmp_path / 'fetched.out'
+    assert conversion_cache.fetch(key, str(destination))
+    assert destination.read_bytes() == b'converted'
+    assert not conversion_cache.fetch('0' * 64, str(tmp_path / 'missing.out'))
+    assert not (tmp_path / 'missing.out').exists()
+
+
+def test_eviction_drops_least_recently_used(tmp_path, monkeypatch):
+    fake_clock(monkeypatch)
+    conversion_cache = ConversionCache(str(tmp_path / 'cache'), max_bytes=25)
+    first = store_output(conversion_cache, tmp_path, 'first.out', b'a' * 10)
+    second = store_output(conversion_cache, tmp_path, 'second.out', b'b' * 10)
+    assert conversion_cache.fetch(first, str(tmp_path / 'used.out'))  # first is now more recently used than second
+    third = store_output(conversion_cache, tmp_path, 'third.out', b'c' * 10)
+    assert conversion_cache.total_bytes() == 20
+    assert not os.path.exists(conversion_cache.object_path(second))
+    assert not conversion_cache.fetch(second, str(tmp_path / 'second-again.out'))
+    assert conversion_cache.fetch(first, str(tmp_path / 'first-again.out'))
+    assert conversion_cache.fetch(third, str(tmp_path / 'third-again.out'))
+
+
+def test_outputs_larger_than_the_cache_are_not_stored(tmp_path):
+    conversion_cache = ConversionCache(str(tmp_path / 'cache'), max_bytes=5)
+    key = store_output(conversion_cache, tmp_path, 'big.out', b'x' * 10)
+    assert conversion_cache.total_bytes() == 0
+    assert not conversion_cache.fetch(key, str(tmp_path / 'fetched.out'))
+
+
+def test_place_file_hardlinks_when_possible(tmp_path):
+    source = tmp_path / 'source.bin'
+    source.write_bytes(b'data')
+    destination = tmp_path / 'destination.bin'
+    destination.write_bytes(b'stale')
+    assert place_file(str(source), str(destination)) == 'hardlink'
+    assert os.path.samefile(source, destination)
+
+
+def test_place_file_copies_when_hardlinks_fail(tmp_path, monkeypatch):
+    def no_link(source, destination):
+        raise OSError('cross-device link')
+    monkeypatch.setattr(os, 'link', no_link)
+    source = tmp_path / 'source.bin'
+    source.write_bytes(b'data' * 1000)
+    destination = tmp_path / 'destination.bin'
+    assert place_file(str(source), str(destination)) in ('reflink', 'copy_file_range', 'copy')
+    assert destination.read_bytes() == source.read_bytes()
+    assert not os.path.samefile(source, destination)
+
+
+def test_fetch_after_object_was_evicted_is_a_miss(tmp_path):
+    # Another worker can evict the object between our index lookup and the link
+    conversion_cache = ConversionCache(str(tmp_path / 'cache'))
+    key = store_output(conversion_cache, tmp_path, 'converted.out', b'converted')
+    os.remove(conversion_cache.object_path(key))
+    assert not conversion_cache.fetch(key, str(tmp_path / 'fetched.out'))
+    assert conversion_cache.total_bytes() == 0
@@ -0,0 +1,26 @@
+import pytest
+
+from pyfileconverter import csvtables
+from pyfileconverter.csvtables import csv_to_docx
+
+
+def test_csv_docx_table_has_every_row_and_column(tmp_path, monkeypatch):
+    docx = pytest.importorskip('docx')
+    monkeypatch.setattr(csvtables, 'SAMPLE_ROWS', 5)  # The table is as wide as the widest sampled row
+    source = tmp_path / 'table.csv'
+    lines = ['name;amount;note'] + [f'item {number};{number};"a; b"' for number in range(20)]
+    lines.append('short;1')  # Padded to the header's width
+    lines.append('long;2;x;y')  # Past the sample, so its extra cells are folded into the last column
+    source.write_text('\n'.join(lines) + '\n')
+    output = tmp_path / 'table.docx'
+    csv_to_docx(str(source), str(output))
+
+    tables = docx.Document(str(output)).tables
+    assert len(tables) == 1
+    rows = tables[0].rows
+    assert len(rows) == 23
+    assert all(len(row.cells) == 3 for row in rows)
+    assert [cell.text for cell in rows[0].cells] == ['name', 'amount', 'note']
+    assert [cell.text for cell in rows[1].cells] == ['item 0', '0', 'a; b']
+    assert [cell.text for cell in rows[-2].cells] == ['short', '1', '']
+    assert [cell.text for cell in rows[-1].cells] == ['long', '2', 'x, y']
@@ -0,0 +1,96 @@
+import os
+import sys
+import types
+import zipfile
+
+import pytest
+
+from pyfileconverter import engine
+from pyfileconverter.engine import ConversionError
+from pyfileconverter.registry import Converter
+
+
+def write_docx(path):
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml', '<w:document/>')
+
+
+def failing_converter(source_path, output_path):
+    with open(output_path, 'w') as output:
+        output.write('half a file')
+    raise RuntimeError('failed mid-write')
+
+
+def test_failed_conversion_leaves_no_partial_output(tmp_path):
+    source = tmp_path / 'notes.txt'
+    source.write_text('hello\n')
+    output = tmp_path / 'notes.docx'
+    route = [(Converter('failing', failing_converter, ['.txt'], ['.docx']), '.docx')]
+    with pytest.raises(RuntimeError):
+        engine.run_route(route, str(source), str(output))
+    assert sorted(os.listdir(tmp_path)) == ['notes.txt']
+
+
+def test_docx_to_pdf_without_word_goes_through_text(tmp_path, monkeypatch):
+    word = engine.registry.get('docx_to_pdf')
+    monkeypatch.setattr(word, '_missing', ['docx2pdf'])
+    monkeypatch.setattr(engine.registry, '_routes', {})
+    source = tmp_path / 'report.docx'
+    write_docx(source)
+    route = engine.find_route(str(source), '.pdf')
+    assert [converter.name for converter, _ in route] == ['docx_to_txt', 'text_file_to_pdf']
+
+
+def test_missing_backend_is_named_in_the_error(tmp_path, monkeypatch):
+    for name in ('docx_to_pdf', 'docx_to_txt'):
+        monkeypatch.setattr(engine.registry.get(name), '_missing', ['docx2pdf'])
+    monkeypatch.setattr(engine.registry, '_routes', {})
+    source = tmp_path / 'report.docx'
+    write_docx(source)
+    with pytest.raises(ConversionError, match='needs docx2pdf to be installed'):
+        engine.find_route(str(source), '.pdf')
+
+
+def test_text_is_not_rendered_to_an_image_through_pdf(tmp_path):
+    source = tmp_path / 'notes.txt'
+    source.write_text('page one\f page two\n')
+    with pytest.raises(ConversionError, match='not supported'):
+        engine.find_route(str(source), '.png')
+
+
+def test_batch_docx_to_pdf_replaces_outputs_without_writing_into_them(tmp_path, monkeypatch):
+    def convert(input_dir, output_dir):  # Stands in for Word: the second document fails
+        for name in os.listdir(input_dir):
+            if name != '1.docx':
+                (tmp_path / output_dir / name.replace('.docx', '.pdf')).write_bytes(b'%PDF-1.4 converted')
+
+    monkeypatch.setitem(sys.modules, 'docx2pdf', types.SimpleNamespace(convert=convert))
+    cached = tmp_path / 'cached.pdf'
+    cached.write_bytes(b'%PDF-1.4 cached')
+    first, second = tmp_path / 'first.pdf', tmp_path / 'second.pdf'
+    os.link(cached, first)  # Like an output served from the cache
+    jobs = [(str(tmp_path / 'first.docx'), str(first)), (str(tmp_path / 'second.docx'), str(second))]
+    for source, _ in jobs:
+        write_docx(source)
+    failures = engine.docx_to_pdf_batch(jobs)
+    assert list(failures) == [jobs[1][0]]
+    assert first.read_bytes() == b'%PDF-1.4 converted'
+    assert cached.read_bytes() == b'%PDF-1.4 cached'
+    assert not second.exists()
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.')]
+
+
+@pytest.mark.parametrize('name, header, options, reencoded', [
+    ('photo.png', b'\x89PNG\r\n\x1a\n', {'quality': 80, 'progressive': True}, False),  # JPEG-only settings
+    ('photo.png', b'\x89PNG\r\n\x1a\n', {'compress_level': 9}, True),
+    ('photo.png', b'\x89PNG\r\n\x1a\n', {'max_size': '100x100'}, True),
+    ('photo.png', b'\x89PNG\r\n\x1a\n', {'max_pixels': 1000, 'quality': None}, False),
+    ('photo.jpg', b'\xff\xd8\xff\xe0', {'quality': 80}, True),
+    ('photo.jpg', b'\xff\xd8\xff\xe0', {'compress_level': 9}, False),
+])
+def test_same_format_reencodes_only_for_options_that_apply(tmp_path, name, header, options, reencoded):
+    source = tmp_path / name
+    source.write_bytes(header + b'\0' * 64)
+    route = engine.find_route(str(source), os.path.splitext(name)[1], options)
+    assert bool(route) == reencoded
@@ -0,0 +1,132 @@
+import codecs
+import struct
+import zipfile
+
+import pytest
+
+from pyfileconverter import engine
+from pyfileconverter.engine import ConversionError
+from pyfileconverter.formats import FileFormat, sniff_format, text_encoding
+
+TEXT = "Quarterly report\nTotals: 12,5 €\n" * 20
+
+
+def sniff(tmp_path, content, name='file.bin'):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return sniff_format(str(path))
+
+
+def bmp_header(dib_size=40):
+    return b'BM' + struct.pack('<IHHI', 70, 0, 0, 54) + struct.pack('<Iii', dib_size, 1, 1) + b'\0' * 40
+
+
+def ftyp(major, *compatible):
+    box = major + b'\0\0\0\0' + b''.join(compatible)
+    return struct.pack('>I', 8 + len(box)) + b'ftyp' + box + b'\0' * 16
+
+
+# START - PDF headers
+def test_pdf_header(tmp_path):
+    assert sniff(tmp_path, b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n1 0 obj') == FileFormat('.pdf')
+
+
+def test_pdf_header_after_bom_and_whitespace(tmp_path):
+    assert sniff(tmp_path, codecs.BOM_UTF8 + b'\r\n  %PDF-1.4\n') == FileFormat('.pdf')
+
+
+def test_pdf_header_after_binary_junk(tmp_path):
+    junk = bytes(range(256)) * 2
+    assert sniff(tmp_path, junk + b'%PDF-1.4\n' + bytes(range(128, 256)) * 8) == FileFormat('.pdf')
+
+
+def test_text_mentioning_the_pdf_header_is_text(tmp_path):
+    content = b'Notes on the format: every file starts with %PDF- and a version.\n'
+    assert sniff(tmp_path, content, 'notes.txt') == FileFormat('.txt', 'utf-8')
+
+
+def test_text_named_pdf_is_not_copied_as_a_pdf(tmp_path):
+    path = tmp_path / 'notes.pdf'
+    path.write_bytes(b'These notes mention %PDF-1.7 but are plain text.\n')
+    with pytest.raises(ConversionError, match='does not look like a .pdf file'):
+        engine.convert_file(str(path), '.pdf', str(tmp_path / 'out'))
+    assert not (tmp_path / 'out' / 'notes.pdf').exists()
+# STOP - PDF headers
+
+
+# START - Text encodings
+@pytest.mark.parametrize('codec, expected', [
+    ('utf-8', 'utf-8'),
+    ('utf-8-sig', 'utf-8-sig'),
+    ('utf-16', 'utf-16'),  # Python writes a BOM
+    ('utf-16-le', 'utf-16-le'),
+    ('utf-16-be', 'utf-16-be'),
+    ('cp1252', 'cp1252'),
+])
+def test_text_encoding(codec, expected):
+    head = TEXT.encode(codec)
+    assert text_encoding(head) == expected
+    assert head.decode(expected) == TEXT
+
+
+def test_utf16_with_a_big_endian_bom():
+    head = codecs.BOM_UTF16_BE + TEXT.encode('utf-16-be')
+    assert text_encoding(head) == 'utf-16'
+    assert head.decode('utf-16') == TEXT
+
+
+def test_utf8_cut_mid_character():
+    head = ('é' * 10).encode('utf-8')[:-1]
+    assert text_encoding(head) == 'utf-8'
+
+
+def test_binary_is_not_text():
+    assert text_encoding(bytes(range(256)) * 4) is None
+    assert text_encoding(b'\x00\x00\x00\x01' * 100) is None
+
+
+def test_utf16_sniffed_as_text(tmp_path):
+    assert sniff(tmp_path, TEXT.encode('utf-16-le'), 'notes.log') == FileFormat('.txt', 'utf-16-le')
+    assert sniff(tmp_path, TEXT.encode('utf-16'), 'notes.log') == FileFormat('.txt', 'utf-16')
+# STOP - Text encodings
+
+
+# START - Signatures
+def test_bmp(tmp_path):
+    assert sniff(tmp_path, bmp_header()) == FileFormat('.bmp')
+    assert sniff(tmp_path, bmp_header(dib_size=124)) == FileFormat('.bmp')
+
+
+def test_bmp_lookalikes_are_text(tmp_path):
+    assert sniff(tmp_path, b'BMW service history\n' * 5) == FileFormat('.txt', 'utf-8')
+    assert sniff(tmp_path, b'BM') == FileFormat('.txt', 'utf-8')  # Too short for a header
+    assert sniff(tmp_path, bmp_header(dib_size=41)) != FileFormat('.bmp')
+
+
+@pytest.mark.parametrize('head, extension', [
+    (ftyp(b'heic', b'mif1', b'heic'), '.heic'),
+    (ftyp(b'mif1', b'mif1', b'heic'), '.heic'),
+    (ftyp(b'mif1', b'mif1', b'avif'), '.mp4'),  # AVIF shares HEIF's container, but isn't HEIC
+    (ftyp(b'qt  ', b'qt  '), '.mov'),
+    (ftyp(b'isom', b'isom', b'avc1', b'mp41'), '.mp4'),
+    (ftyp(b'M4A ', b'M4A ', b'mp42'), '.mp4'),
+])
+def test_ftyp_brands(tmp_path, head, extension):
+    assert sniff(tmp_path, head).extension == extension
+
+
+def test_docx(tmp_path):
+    path = tmp_path / 'report.docx'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml', '<w:document/>')
+    assert sniff_format(str(path)) == FileFormat('.docx')
+
+
+def test_html_saved_as_docx(tmp_path):
+    path = tmp_path / 'report.docx'
+    path.write_bytes(b'<!DOCTYPE html>\n<html><head><title>404 Not Found</title></head></html>\n')
+    assert sniff_format(str(path)) == FileFormat('.txt', 'utf-8')
+    with pytest.raises(ConversionError, match='does not look like a .docx file'):
+        engine.source_format(str(path))
+# STOP - Signatures
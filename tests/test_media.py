@@ -0,0 +1,76 @@
+import os
+import shutil
+import subprocess
+import sys
+from array import array
+
+import pytest
+
+from pyfileconverter import media
+from pyfileconverter.media import plan_segments
+
+
+def test_plan_segments_without_packets():
+    assert plan_segments(array('d'), array('d')) == []
+
+
+def test_plan_segments_with_a_single_keyframe():
+    times = array('d', [index / 25 for index in range(25 * 90)])
+    assert plan_segments(times, array('d', [0.0]), 30) == [(0.0, len(times))]
+
+
+def test_plan_segments_cut_at_keyframes_and_keep_every_frame():
+    times = array('d', [index / 25 for index in range(25 * 100)])
+    keyframes = array('d', [second for second in range(0, 100, 2)])
+    segments = plan_segments(times, keyframes, 30)
+    assert [start for start, _ in segments] == [0.0, 30.0, 60.0]
+    assert sum(count for _, count in segments) == len(times)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="needs ffmpeg")
+def test_segmented_transcode_keeps_every_frame(tmp_path, monkeypatch):
+    # A source whose timestamps start at 3.5 s, so segment seeks must count from the container's start time, cut
+    # into 4 s segments (-frames:v per segment) that are joined with the separately encoded audio (concat, -c copy)
+    av = pytest.importorskip('av')
+    source = str(tmp_path / 'offset.mkv')
+    subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc=size=64x48:rate=25',
+                    '-f', 'lavfi', '-i', 'sine', '-t', '12', '-c:v', 'mpeg2video', '-g', '25', '-c:a', 'mp2',
+                    '-output_ts_offset', '3.5', source], check=True)
+    monkeypatch.setattr(media, 'MIN_PARALLEL_SECONDS', 0)
+    calls = []
+    run_all = media.FfmpegJobs.run_all
+    monkeypatch.setattr(media.FfmpegJobs, 'run_all', lambda self, jobs: calls.append(jobs) or run_all(self, jobs))
+    output = str(tmp_path / 'offset.mp4')
+    media.transcode_media(source, output, '.mp4', segment_seconds=4, segment_workers=2)
+
+    segment_commands = [command for command, job, _, _ in calls[0] if job != 'audio']
+    assert len(segment_commands) == 3
+    assert [command[command.index('-ss') + 1] for command in segment_commands[1:]] == ['4.000000', '8.000000']
+    with av.open(output) as container:
+        assert len(container.streams.audio) == 1
+        times = [frame.time for frame in container.decode(video=0)]
+    assert len(times) == 12 * 25
+    assert times == sorted(set(times))  # No frame doubled or out of order at the seams
+    assert sorted(os.listdir(tmp_path)) == ['offset.mkv', 'offset.mp4']
+
+
+@pytest.mark.skipif(shutil.which('sh') is None, reason="needs a POSIX shell")
+def test_child_processes_do_not_inherit_the_worker_memory_limit():
+    resource = pytest.importorskip('resource')
+    if resource.getrlimit(resource.RLIMIT_AS)[1] != resource.RLIM_INFINITY:
+        pytest.skip("the address space already has a hard limit")
+    script = (
+        "import resource, subprocess\n"
+        "from pyfileconverter.media import child_memory_limit_lifted\n"
+        "from pyfileconverter.scheduler import limit_worker_memory\n"
+        "limit_worker_memory(256 * 1024 * 1024)\n"
+        "capped = subprocess.run(['sh', '-c', 'ulimit -v'], capture_output=True, text=True).stdout.strip()\n"
+        "with child_memory_limit_lifted():\n"
+        "    lifted = subprocess.run(['sh', '-c', 'ulimit -v'], capture_output=True, text=True).stdout.strip()\n"
+        "print(capped, lifted, resource.getrlimit(resource.RLIMIT_AS)[0])\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout.split()
+    capped, lifted, restored = output
+    assert capped != 'unlimited'
+    assert lifted == 'unlimited'
+    assert int(restored) == 768 * 1024 * 1024
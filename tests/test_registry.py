@@ -0,0 +1,104 @@
+import pytest
+
+from pyfileconverter.registry import Converter, ConverterRegistry, normalize_extension
+
+MISSING_MODULE = 'pyfileconverter_test_missing_backend'
+
+
+def noop(source_path, output_path):
+    pass
+
+
+def add(registry, name, sources, targets, cost=1, requires=()):
+    converter = Converter(name, noop, sources, targets, cost, requires=requires)
+    registry.add(converter)
+    return converter
+
+
+def names(route):
+    return [(converter.name, target) for converter, target in route]
+
+
+@pytest.fixture
+def registry():
+    registry = ConverterRegistry()
+    add(registry, 'docx_to_pdf', ['.docx'], ['.pdf'], cost=3)
+    add(registry, 'docx_to_txt', ['.docx'], ['.txt'], cost=2)
+    add(registry, 'txt_to_pdf', ['.txt'], ['.pdf'], cost=2)
+    add(registry, 'csv_to_txt', ['.csv'], ['.txt'], cost=1)
+    return registry
+
+
+def test_normalize_extension():
+    assert normalize_extension('PDF') == '.pdf'
+    assert normalize_extension(' .Txt ') == '.txt'
+    assert normalize_extension('') == ''
+
+
+def test_direct_step_wins_when_cheaper(registry):
+    assert names(registry.find_route('.docx', '.pdf')) == [('docx_to_pdf', '.pdf')]
+
+
+def test_cheapest_chain_wins_over_expensive_direct_step(registry):
+    add(registry, 'csv_to_pdf', ['.csv'], ['.pdf'], cost=5)
+    assert names(registry.find_route('csv', 'PDF')) == [('csv_to_txt', '.txt'), ('txt_to_pdf', '.pdf')]
+
+
+def test_unreachable_target(registry):
+    assert registry.find_route('.pdf', '.docx') is None
+    assert registry.find_route('.xyz', '.pdf') is None
+
+
+def test_same_format_is_an_empty_route(registry):
+    assert registry.find_route('.txt', '.txt') == []
+
+
+def test_routes_are_memoized(registry):
+    route = registry.find_route('.csv', '.pdf')
+    assert registry.find_route('.csv', '.pdf') is route
+
+
+def test_memo_is_cleared_when_a_converter_is_added(registry):
+    assert registry.find_route('.csv', '.pdf') is not None
+    assert registry.find_route('.csv', '.docx') is None
+    add(registry, 'txt_to_docx', ['.txt'], ['.docx'])
+    assert names(registry.find_route('.csv', '.docx')) == [('csv_to_txt', '.txt'), ('txt_to_docx', '.docx')]
+
+
+def test_unavailable_backend_falls_back_to_next_cheapest_route():
+    registry = ConverterRegistry()
+    word = add(registry, 'docx_to_pdf', ['.docx'], ['.pdf'], cost=3, requires=[MISSING_MODULE])
+    add(registry, 'docx_to_txt', ['.docx'], ['.txt'], cost=2)
+    add(registry, 'txt_to_pdf', ['.txt'], ['.pdf'], cost=2)
+    assert not word.available
+    assert word.missing_requirements() == [MISSING_MODULE]
+    assert names(registry.find_route('.docx', '.pdf')) == [('docx_to_txt', '.txt'), ('txt_to_pdf', '.pdf')]
+    assert names(registry.find_route('.docx', '.pdf', available_only=False)) == [('docx_to_pdf', '.pdf')]
+    assert registry.direct_converter('.docx', '.pdf') is None
+
+
+def test_no_route_when_only_unavailable_backends_lead_there():
+    registry = ConverterRegistry()
+    add(registry, 'docx_to_pdf', ['.docx'], ['.pdf'], requires=[MISSING_MODULE])
+    assert registry.find_route('.docx', '.pdf') is None
+
+
+def test_any_of_alternative_requirements():
+    converter = Converter('docx_to_txt', noop, ['.docx'], ['.txt'], requires=[(MISSING_MODULE, 'json')])
+    assert converter.available
+    converter = Converter('docx_to_txt', noop, ['.docx'], ['.txt'], requires=[(MISSING_MODULE, MISSING_MODULE + '2')])
+    assert converter.missing_requirements() == [f"{MISSING_MODULE} or {MISSING_MODULE}2"]
+
+
+def test_direct_only_converter_is_never_reached_through_other_steps(registry):
+    render = Converter('pdf_to_image', noop, ['.pdf'], ['.png'], cost=3, direct_only=True)
+    registry.add(render)
+    assert names(registry.find_route('.pdf', '.png')) == [('pdf_to_image', '.png')]
+    assert registry.find_route('.txt', '.png') is None
+    assert registry.find_route('.docx', '.png') is None
+    assert registry.direct_converter('.pdf', '.png') is render
+
+
+def test_missing_tool_makes_a_converter_unavailable():
+    converter = Converter('transcode', noop, ['.avi'], ['.mp4'], tools=[MISSING_MODULE])
+    assert converter.missing_requirements() == [MISSING_MODULE]
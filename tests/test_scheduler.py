@@ -0,0 +1,122 @@
+import os
+import time
+
+from pyfileconverter import events
+from pyfileconverter.scheduler import CONVERTED, FAILED, BatchScheduler, FileResult
+
+
+def slow_convert(file, conversion_extension, output_dir=None, cache=None, options=None):
+    started_at = time.time()
+    events.report_started(file)
+    time.sleep(0.2)
+    result = FileResult(file, CONVERTED, file + conversion_extension)
+    result.started_at = started_at
+    return result.measured()
+
+
+def test_started_is_emitted_when_a_worker_picks_the_file_up():
+    files = [f"file{index}.txt" for index in range(4)]
+    received = []
+    scheduler = BatchScheduler(workers=1, convert=slow_convert, observers=[received.append])
+    results = list(scheduler.run(files, '.pdf'))
+    assert [result.status for result in results] == [CONVERTED] * len(files)
+
+    started = {event.file: event for event in received if event.kind == events.STARTED}
+    finished = {event.file: event for event in received if event.kind == events.FINISHED}
+    assert len([event for event in received if event.kind == events.STARTED]) == len(files)
+    for previous, file in zip(files, files[1:]):
+        # A single worker only picks a file up once it is done with the previous one, however many are queued
+        assert started[file].timestamp >= finished[previous].timestamp - 0.05
+    for file in files:
+        assert started[file].pid == finished[file].pid
+        assert started[file].timestamp < finished[file].timestamp
+        kinds = [event.kind for event in received if event.file == file]
+        assert kinds.index(events.STARTED) < kinds.index(events.FINISHED)
+
+
+def write_convert(file, conversion_extension, output_dir=None, cache=None, options=None):
+    output_file = os.path.join(output_dir, os.path.basename(file) + conversion_extension)
+    with open(output_file, 'w') as output:
+        output.write(str(os.getpid()))
+    return FileResult(file, CONVERTED, output_file).measured()
+
+
+def test_files_can_have_their_own_output_dir(tmp_path):
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    first.mkdir()
+    second.mkdir()
+    scheduler = BatchScheduler(workers=1, convert=write_convert)
+    jobs = [('a.txt', str(first)), ('b.txt', str(second)), 'c.txt']
+    results = list(scheduler.run(jobs, '.pdf', str(first)))
+    assert sorted(result.output_file for result in results) == sorted([
+        str(first / 'a.txt.pdf'), str(second / 'b.txt.pdf'), str(first / 'c.txt.pdf')])
+
+
+def test_kept_pool_is_reused_across_batches(tmp_path):
+    scheduler = BatchScheduler(workers=1, convert=write_convert, keep_pool=True)
+    try:
+        first = list(scheduler.run(['a.txt'], '.pdf', str(tmp_path)))
+        second = list(scheduler.run(['b.txt'], '.pdf', str(tmp_path)))
+        assert first[0].pid == second[0].pid
+    finally:
+        scheduler.close()
+    assert scheduler._pool is None
+
+
+def options_convert(file, conversion_extension, output_dir=None, cache=None, options=None):
+    return FileResult(file, CONVERTED, message=str(options.get('segment_workers'))).measured()
+
+
+def write_media(tmp_path, count, name='clip{}.mp4'):
+    files = []
+    for index in range(count):
+        path = tmp_path / name.format(index)
+        path.write_bytes(b'\0\0\0\x14ftypisom\0\0\0\0isom' + b'\0' * 16)
+        files.append(str(path))
+    return files
+
+
+def test_segment_workers_share_the_cores_between_media_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+    scheduler = BatchScheduler(workers=4, convert=options_convert)
+    [single] = write_media(tmp_path, 1, 'single{}.mp4')
+    assert [result.message for result in scheduler.run([single], '.mov')] == ['8']
+    results = list(scheduler.run(write_media(tmp_path, 10), '.mov'))
+    assert {result.message for result in results} == {'2'}
+
+
+def test_segment_workers_only_count_media_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+    notes = []
+    for index in range(9):
+        path = tmp_path / f"notes{index}.txt"
+        path.write_text('text\n')
+        notes.append(str(path))
+    [video] = write_media(tmp_path, 1)
+    scheduler = BatchScheduler(workers=4, convert=options_convert)
+    results = {result.file: result.message for result in scheduler.run(notes + [video], '.mov')}
+    assert results[video] == '8'
+    assert {results[file] for file in notes} == {'None'}
+
+
+def test_segment_workers_picked_by_the_caller_are_kept(tmp_path):
+    scheduler = BatchScheduler(workers=2, convert=options_convert)
+    results = list(scheduler.run(write_media(tmp_path, 3), '.mov', options={'segment_workers': 3}))
+    assert {result.message for result in results} == {'3'}
+
+
+def test_outputs_that_would_overwrite_each_other_fail(tmp_path):
+    for relative in ('ca/x.txt', 'cb/x.txt', 'e.txt', 'e.csv'):
+        path = tmp_path / relative
+        path.parent.mkdir(exist_ok=True)
+        path.write_text('a,b\n')
+    output_dir = tmp_path / 'col'
+    output_dir.mkdir()
+    files = [str(tmp_path / relative) for relative in ('ca/x.txt', 'cb/x.txt', 'e.txt', 'e.csv')]
+    scheduler = BatchScheduler(workers=1, convert=write_convert)
+    results = {result.file: result for result in scheduler.run(files, '.docx', str(output_dir))}
+    assert results[files[0]].status == CONVERTED
+    assert results[files[2]].status == CONVERTED
+    for file, earlier in ((files[1], files[0]), (files[3], files[2])):
+        assert results[file].status == FAILED
+        assert f"would overwrite the output of {earlier}" in results[file].message
@@ -0,0 +1,32 @@
+import zipfile
+
+import pytest
+
+from pyfileconverter.textdocx import text_file_to_docx
+
+PAGE_BREAK = '<w:br w:type="page"/>'
+
+
+def test_text_docx_drops_invalid_xml_and_breaks_pages_on_form_feeds(tmp_path):
+    docx = pytest.importorskip('docx')
+    source = tmp_path / 'log.txt'
+    source.write_text('null\x00 and bell\x07 here\n\tindented\nend of page\x0cnext page\n\x0cthird page\n',
+                      encoding='utf-8')
+    output = tmp_path / 'log.docx'
+    text_file_to_docx(str(source), str(output))
+
+    with zipfile.ZipFile(output) as archive:
+        assert archive.read('word/document.xml').decode('utf-8').count(PAGE_BREAK) == 2
+    texts = [paragraph.text for paragraph in docx.Document(str(output)).paragraphs]
+    assert [text for text in texts if text] == ['null and bell here', '\tindented', 'end of page', 'next page',
+                                                'third page']
+
+
+def test_text_docx_blocks_join_lines_until_a_blank_line(tmp_path):
+    docx = pytest.importorskip('docx')
+    source = tmp_path / 'prose.txt'
+    source.write_text('first line\nsecond line\n\nnext block\n', encoding='utf-8')
+    output = tmp_path / 'prose.docx'
+    assert text_file_to_docx(str(source), str(output), paragraphs='blocks') == 2
+    texts = [paragraph.text for paragraph in docx.Document(str(output)).paragraphs]
+    assert texts == ['first line\nsecond line', 'next block']
@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+from pyfileconverter.pdfwriter import StreamingPdfWriter
+from pyfileconverter.textpdf import text_file_to_pdf
+
+
+def xref_offsets(data):
+    # Byte offsets listed in the cross-reference table, by object number
+    start = int(re.search(rb'startxref\n(\d+)', data).group(1))
+    header = re.match(rb'xref\n0 (\d+)\n', data[start:])
+    entries = data[start + header.end():].split(b'\n')[:int(header.group(1))]
+    return {number: int(entry[:10]) for number, entry in enumerate(entries) if entry.endswith(b' n ')}
+
+
+def test_xref_points_at_every_object(tmp_path):
+    output = tmp_path / 'pages.pdf'
+    with StreamingPdfWriter(str(output)) as pdf:
+        font = pdf.font()
+        for number in range(3):
+            pdf.add_page(b'BT /%s 12 Tf 72 720 Td (page %d) Tj ET' % (font, number))
+    data = output.read_bytes()
+    offsets = xref_offsets(data)
+    assert offsets
+    for number, offset in offsets.items():
+        assert data[offset:].startswith(b'%d 0 obj\n' % number)
+
+
+def test_text_pdf_opens_with_one_page_per_form_feed(tmp_path):
+    pypdf = pytest.importorskip('pypdf')
+    source = tmp_path / 'notes.txt'
+    source.write_text('first page\n\fsecond page\n\fthird page\n')
+    output = tmp_path / 'notes.pdf'
+    assert text_file_to_pdf(str(source), str(output)) == 3
+    reader = pypdf.PdfReader(str(output), strict=True)
+    assert len(reader.pages) == 3
+    assert 'second page' in reader.pages[1].extract_text()
+
+
+def test_long_text_pdf_spans_pages(tmp_path):
+    pypdf = pytest.importorskip('pypdf')
+    source = tmp_path / 'long.txt'
+    source.write_text(''.join(f'line {number}\n' for number in range(200)))
+    output = tmp_path / 'long.pdf'
+    page_count = text_file_to_pdf(str(source), str(output))
+    assert page_count > 1
+    reader = pypdf.PdfReader(str(output), strict=True)
+    assert len(reader.pages) == page_count
+    assert 'line 199' in reader.pages[-1].extract_text()
+
+
+def test_empty_text_pdf_has_a_blank_page(tmp_path):
+    pypdf = pytest.importorskip('pypdf')
+    source = tmp_path / 'empty.txt'
+    source.write_text('')
+    output = tmp_path / 'empty.pdf'
+    assert text_file_to_pdf(str(source), str(output)) == 1
+    assert len(pypdf.PdfReader(str(output), strict=True).pages) == 1
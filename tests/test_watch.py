@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from pyfileconverter.watch import FolderWatcher
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 32
+JPEG = b'\xff\xd8\xff\xe0' + b'\0' * 32
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    (tmp_path / 'inbox').mkdir()
+    watcher = FolderWatcher(str(tmp_path / 'inbox'), str(tmp_path / 'out'), '.jpeg')
+    yield watcher
+    watcher.manifest.close()
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / 'inbox' / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_wants_skips_files_already_in_the_target_format(tmp_path, watcher):
+    assert not watcher.wants(write(tmp_path, 'photo.jpg', JPEG))
+    assert not watcher.wants(write(tmp_path, 'photo.JPEG', JPEG))
+    assert not watcher.wants(write(tmp_path, '.photo.png', PNG))
+    assert watcher.wants(write(tmp_path, 'photo.png', PNG))
+
+
+def test_wants_goes_by_content_like_the_convert_command(tmp_path, watcher):
+    assert watcher.wants(write(tmp_path, 'scan.jpg', PNG))  # A PNG named .jpg still needs converting
+    assert not watcher.wants(write(tmp_path, 'server.log', b'GET / 200\n'))  # Text has no route to .jpeg
+    watcher.conversion_extension = '.pdf'
+    assert watcher.wants(str(tmp_path / 'inbox' / 'server.log'))
+
+
+def test_once_mirrors_the_inbox_folders(tmp_path):
+    inbox = tmp_path / 'inbox'
+    for index in range(3):
+        (inbox / f"folder{index}").mkdir(parents=True)
+        (inbox / f"folder{index}" / 'notes.csv').write_text('a,b\n1,2\n')
+    (inbox / 'folder0' / 'already.txt').write_text('plain text\n')
+    watcher = FolderWatcher(str(inbox), str(tmp_path / 'out'), '.txt', settle_seconds=0, poll_interval=0.05,
+                            workers=1, use_native_events=False)
+    watcher.run(once=True)
+    for index in range(3):
+        assert os.path.exists(tmp_path / 'out' / f"folder{index}" / 'notes.txt')
+    assert not os.path.exists(tmp_path / 'out' / 'folder0' / 'already.txt')
+    assert watcher.scheduler._pool is None  # Shut down once the watcher stops
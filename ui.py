@@ -2,14 +2,13 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter.font import Font
 import ttkbootstrap as ttk
-import os  # For file accessing
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from docx2pdf import convert
-import pypandoc  # For DOCX -> TXT
-from PIL import Image
-from docx import Document
-import re
+import queue
+import threading
+from pyfileconverter import engine  # Headless conversion engine (loads converter libraries lazily)
+from pyfileconverter.cache import ConversionCache
+from pyfileconverter.events import BatchSummary, CANCELLED, FINISHED, SKIPPED
+from pyfileconverter.filelist import FileListModel, iter_folder_files
+from pyfileconverter.scheduler import FAILED, BatchScheduler, default_worker_count
 
 # Centralized UI color variables
 UI_COLORS = {
@@ -33,11 +32,23 @@ class FileConverterApp:
         # Set the application icon
         self.root.iconphoto(False, tk.PhotoImage(file="assets/app_icon/png/pyfileconverter_icon.png"))
         
-        # Create list for files
-        self.selected_file_list = []
+        # Create list for files (the Treeview only ever holds the rows that are visible, see refresh_file_list)
+        self.file_model = FileListModel()
+        self.view_offset = 0  # Position in the model of the first visible row
+        self.visible_row_count = 10
+        self.row_entry_ids = {}  # Maps each Treeview row to the model entry it is currently showing
+        
+        # Folder imports are scanned on a background thread and handed over in chunks
+        self.import_queue = queue.Queue()
+        self.import_running = False
+        
+        # Converts the batch on a pool of worker processes so the window stays responsive
+        self.scheduler = BatchScheduler()
+        self.worker_count_var = tk.IntVar(value=self.scheduler.workers)
+        self.use_cache_var = tk.BooleanVar(value=True)  # Reuse outputs of files that were already converted
         
         # Establish the valid filetypes
-        self.valid_extensions = ['.bmp', '.jpg', '.jpeg', '.png', '.pdf', '.txt', '.docx', '.csv']
+        self.valid_extensions = list(engine.VALID_EXTENSIONS)
         
         # Initialize the style
         self.style = ttk.Style()
@@ -60,9 +71,13 @@ class FileConverterApp:
                             foreground=UI_COLORS['light'])
         self.style.map('Large.TButton', background=[('active', UI_COLORS['secondary'])])
         
-        # Create main and settings frames
+        # Create main, settings and summary frames
         self.main_frame = ttk.Frame(root)
         self.settings_frame = ttk.Frame(root)
+        self.summary_frame = ttk.Frame(root)
+        
+        # Totals of the current batch, fed by the scheduler's events
+        self.batch_summary = BatchSummary()
         
         # Pack main frame and initialize settings frame
         self.main_frame.pack(fill=tk.BOTH, expand=True)
@@ -74,6 +89,9 @@ class FileConverterApp:
         # Create widgets for the settings frame
         self.create_settings_widgets()
         
+        # Create widgets for the summary frame (shown after a batch finishes)
+        self.create_summary_widgets()
+        
         # Set initial theme
         self.set_theme(self.current_theme)
         
@@ -115,11 +133,21 @@ class FileConverterApp:
                                     style='Custom.TButton')
         import_button.pack(side=tk.TOP, pady=10)
         
+        # Create the Import Folder button (imports every supported file in the folder and its subfolders)
+        import_folder_button = ttk.Button(middle_right_frame, text="Import Folder", command=self.on_import_folder,
+                                            style='Custom.TButton')
+        import_folder_button.pack(side=tk.TOP, pady=10)
+        
         # Create the Convert button
         convert_button = ttk.Button(middle_right_frame, text="Convert Files", command=lambda: self.convert_file(self.conversion_type_var.get()),
                                     style='Custom.TButton')
         convert_button.pack(side=tk.BOTTOM, pady=10)
         
+        # Create the Cancel button (stops the files of a running batch that have not started yet)
+        self.cancel_button = ttk.Button(middle_right_frame, text="Cancel", command=self.cancel_conversion,
+                                        style='danger', state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.BOTTOM, pady=10)
+        
         # Create the dropdown for filetype selection
         self.filetype_dropdown = ttk.Combobox(middle_right_frame, textvariable=self.conversion_type_var, values=self.valid_extensions, state='readonly')
         self.filetype_dropdown.pack(side=tk.RIGHT, pady=5)
@@ -129,17 +157,31 @@ class FileConverterApp:
         self.file_list_frame.grid(row=1, column=0, columnspan=2, pady=10, padx=10, sticky="nsew")
         
         # Create Treeview for file list
-        self.file_list = ttk.Treeview(self.file_list_frame, columns=("No", "File Name", "Additional Info"),
+        self.file_list = ttk.Treeview(self.file_list_frame, columns=("No", "File Name", "Additional Info", "Status"),
                                     show="headings")
         self.file_list.heading("No", text="#", anchor="e")  # Number of files heading
         self.file_list.heading("File Name", text="File Name", anchor="w")  # File name heading
         self.file_list.heading("Additional Info", text="Output Filetype", anchor="w")  # Additional information heading
+        self.file_list.heading("Status", text="Status", anchor="w")  # Conversion status heading
         self.file_list.column("No", width=10, anchor="e")  # Number of files column
         self.file_list.column("File Name", width=50, anchor="w")  # File name column
         self.file_list.column("Additional Info", width=50, anchor="w")  # Additional information column
+        self.file_list.column("Status", width=50, anchor="w")  # Conversion status column
+        
+        # The scrollbar drives the position in the model rather than the Treeview itself
+        self.file_list_scrollbar = ttk.Scrollbar(self.file_list_frame, orient=tk.VERTICAL, command=self.on_file_list_scroll)
+        self.file_list_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 20), pady=20)
         
-        # Pack the Treeview with padding on the right side
-        self.file_list.pack(expand=True, fill=tk.BOTH, padx=20, pady=20)  # Add 20px padding on the right side
+        # Pack the Treeview with padding on the left side
+        self.file_list.pack(side=tk.LEFT, expand=True, fill=tk.BOTH, padx=(20, 0), pady=20)
+        
+        # Create the progress bar and its label underneath the file list
+        progress_frame = ttk.Frame(self.main_frame)
+        progress_frame.grid(row=3, column=0, columnspan=3, padx=30, pady=(0, 10), sticky="ew")
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate')
+        self.progress_bar.pack(side=tk.TOP, fill=tk.X)
+        self.progress_label = ttk.Label(progress_frame, text="", font=self.custom_font)
+        self.progress_label.pack(side=tk.TOP, anchor="w")
         
         # Configure grid column weights to ensure proper alignment
         self.main_frame.grid_columnconfigure(0, weight=0, minsize=10)  # Skinny leftmost column
@@ -148,6 +190,12 @@ class FileConverterApp:
         
         # Bind the Treeview select event to start editing
         self.file_list.bind("<Double-1>", self.on_item_double_click)
+        
+        # Recompute how many rows fit when the list is resized, and scroll the model with the mouse wheel
+        self.file_list.bind("<Configure>", self.on_file_list_resize)
+        self.file_list.bind("<MouseWheel>", self.on_file_list_mouse_wheel)  # Windows / macOS
+        self.file_list.bind("<Button-4>", lambda e: self.scroll_file_list(-3))  # Linux scroll up
+        self.file_list.bind("<Button-5>", lambda e: self.scroll_file_list(3))  # Linux scroll down
     
     def on_item_double_click(self, event):
         item = self.file_list.selection()
@@ -182,8 +230,11 @@ class FileConverterApp:
         self.entry.bind('<Return>', lambda e: self.save_edit(item_id, column))
     
     def save_edit(self, item_id, column):
-        # Save the new value and update the Treeview
+        # Save the new value into the model (rows are reused while scrolling) and update the Treeview
         new_value = self.entry.get()
+        entry = self.file_model.get(self.row_entry_ids.get(item_id))
+        if entry is not None and column == 3:
+            entry.output_extension = new_value
         self.file_list.item(item_id, values=self.update_item_values(item_id, column, new_value))
         self.entry.destroy()
     
@@ -205,6 +256,14 @@ class FileConverterApp:
         lightmodeButton = ttk.Button(self.settings_frame, text="Light Mode", command=self.set_theme_light, style='Custom.LargeTButton')
         lightmodeButton.pack(pady=5)
         
+        # Number of worker processes used when converting
+        ttk.Label(self.settings_frame, text="Worker Processes:", font=self.custom_font).pack(pady=(10, 0))
+        ttk.Spinbox(self.settings_frame, from_=1, to=max(default_worker_count() + 1, 1), width=5,
+                    textvariable=self.worker_count_var, state='readonly').pack(pady=5)
+        
+        # Skip files whose exact contents were already converted before
+        ttk.Checkbutton(self.settings_frame, text="Reuse Previous Conversions", variable=self.use_cache_var).pack(pady=5)
+        
         # BACK BUTTON
         ttk.Button(self.settings_frame, text="Back", command=self.back_to_main, style='Custom.TButton').pack(side=tk.TOP, padx=10, pady=10)
         # # APPLY BUTTON
@@ -214,12 +273,52 @@ class FileConverterApp:
         # Initially hide the settings frame
         self.settings_frame.pack_forget()
     
+    def create_summary_widgets(self):
+        # Widgets for the summary of the last batch
+        ttk.Label(self.summary_frame, text="Conversion Complete", font=self.custom_font_title).pack(pady=10)
+        
+        self.summary_label = ttk.Label(self.summary_frame, text="", font=self.custom_font, justify=tk.LEFT)
+        self.summary_label.pack(padx=20, pady=5, anchor="w")
+        
+        # List of the files that failed, with the reason
+        self.summary_failures = ttk.Treeview(self.summary_frame, columns=("File", "Reason"), show="headings", height=5)
+        self.summary_failures.heading("File", text="Failed File", anchor="w")
+        self.summary_failures.heading("Reason", text="Reason", anchor="w")
+        self.summary_failures.pack(expand=True, fill=tk.BOTH, padx=20, pady=5)
+        
+        # BACK BUTTON
+        ttk.Button(self.summary_frame, text="Back", command=self.back_to_main, style='Custom.TButton').pack(side=tk.TOP, padx=10, pady=10)
+        
+        # Initially hide the summary frame
+        self.summary_frame.pack_forget()
+    
     def show_settings(self):
         self.main_frame.pack_forget()
         self.settings_frame.pack(fill=tk.BOTH, expand=True)
     
+    def show_summary(self):
+        summary = self.batch_summary
+        files_per_second = summary.counts[FINISHED] / summary.elapsed
+        self.summary_label.configure(text=(
+            f"Converted: {summary.counts[FINISHED]}    Skipped: {summary.counts[SKIPPED]}    "
+            f"Failed: {summary.counts[FAILED]}    Cancelled: {summary.counts[CANCELLED]}\n"
+            f"Time: {summary.elapsed:.1f} s    Throughput: {files_per_second:.1f} files/s, "
+            f"{summary.bytes_in / 1e6 / summary.elapsed:.2f} MB/s\n"
+            f"Size: {summary.bytes_in / 1e6:.1f} MB in, {summary.bytes_out / 1e6:.1f} MB out\n"
+            f"Time spent decoding {summary.stage_seconds['decode']:.1f} s, transforming "
+            f"{summary.stage_seconds['transform']:.1f} s, encoding {summary.stage_seconds['encode']:.1f} s"
+        ))
+        for item in self.summary_failures.get_children():
+            self.summary_failures.delete(item)
+        for file, reason in summary.failures:
+            self.summary_failures.insert("", "end", values=(file, reason))
+        
+        self.main_frame.pack_forget()
+        self.summary_frame.pack(fill=tk.BOTH, expand=True)
+    
     def show_main(self):
         self.settings_frame.pack_forget()
+        self.summary_frame.pack_forget()
         self.main_frame.pack(fill=tk.BOTH, expand=True)
     
     def set_theme(self, theme_name):
@@ -247,79 +346,112 @@ class FileConverterApp:
         )
         return file_paths
     
-    def convert_file_type(self, file_path, new_extension):
-        # Simulate file conversion process (for demo purposes)
-        return f"{file_path}.{new_extension}"
-    
-    def getFileName(self, str=""):
-        if str == "":
-            print("ERROR: Input string empty")
-            return
-        else:
-            slashIndexList = []  # List to hold the indeces of the slashes within the input filepath string
-            index = 0  # Index counter for iteration
-            for char in str:
-                if char == "/":
-                    slashIndexList.append(index)
-                else:
-                    pass
-                index += 1
-            if slashIndexList != []:  # If the slash list ain't empty
-                lastSlash = slashIndexList[-1]
-                returnStr = str[lastSlash + 1:]
-                return returnStr
-    
     def on_convert(self):  # THIS FUNCTION DOES NOT CONVERT ANYTHING BUT RATHER HANDLES FILE SELECTION!!!
         # Obtain the currently selected files from the user
         files = self.select_files()
         
-        for file in files:  # Save it to the list!
-            self.selected_file_list.append(file)
-        
-        # String cut the filepath to only include the filename and the file extensions
-        
-        if ( len(files) > 10 ):
-            messagebox.showwarning("Too Many Files Selected", "Please select no more than 10 files.")
-            return
-        
         if not files:
             messagebox.showwarning("No files selected", "Please select at least one file.")
             return
         
-        conversion_type = self.conversion_type_var.get()
-        if not conversion_type:
-            messagebox.showwarning("No conversion type", "Please select a conversion type.")
+        # Save them to the list (files that were already imported are skipped) and show them
+        self.file_model.add_paths(files)
+        self.refresh_file_list()
+    
+    def on_import_folder(self):
+        folder = filedialog.askdirectory(title='Select a folder to import')
+        if not folder:
             return
         
-        results = {file: self.convert_file_type(file, conversion_type) for file in files}
+        if self.import_running:
+            messagebox.showwarning("Import running", "Please wait for the current folder import to finish.")
+            return
         
-        # Clear existing entries in the Treeview
-        for item in self.file_list.get_children():
+        # Walk the folder on a background thread so huge trees don't freeze the window
+        self.import_running = True
+        threading.Thread(target=self.scan_folder, args=(folder,), daemon=True).start()
+        self.root.after(100, self.poll_folder_import)
+    
+    def scan_folder(self, folder, chunk_size=2000):
+        chunk = []
+        for path in iter_folder_files(folder):
+            chunk.append(path)
+            if len(chunk) >= chunk_size:
+                self.import_queue.put(chunk)
+                chunk = []
+        self.import_queue.put(chunk)
+        self.import_queue.put(None)  # Marks the end of the scan
+    
+    def poll_folder_import(self):
+        while True:
+            try:
+                chunk = self.import_queue.get_nowait()
+            except queue.Empty:
+                break
+            if chunk is None:
+                self.import_running = False
+                break
+            self.file_model.add_paths(chunk)
+        
+        self.refresh_file_list()
+        if self.import_running:
+            self.root.after(100, self.poll_folder_import)
+        else:
+            print(f"Folder import finished, {len(self.file_model)} files in the list")
+    
+    def refresh_file_list(self):
+        # Only the rows that fit in the window exist in the Treeview, their values are swapped as the list scrolls
+        self.view_offset = max(0, min(self.view_offset, len(self.file_model) - self.visible_row_count))
+        rows = self.file_model.rows(self.view_offset, self.visible_row_count)
+        
+        items = list(self.file_list.get_children())
+        while len(items) < len(rows):
+            items.append(self.file_list.insert("", "end", values=("", "", "", "")))
+        for item in items[len(rows):]:
             self.file_list.delete(item)
         
-        # DELETE ALL DELETE BUTTONS BC THIS PROCESS DELETES ALL PREVIOUS ENTRIES INTO THE TABLE/LIST
-        # Remove the delete buttons
-        # listOfDeleteButtonIDs = []
-        # for item_id in self.delete_buttons:
-        #     print("Delete Button ID:", item_id, "will be destroyed...")
-        #     listOfDeleteButtonIDs.append(item_id)  # Append the current item ID into the list that contains which buttons to delete
-        # for deleteButton in listOfDeleteButtonIDs:
-        #     self.delete_buttons[deleteButton].destroy()
-        #     del self.delete_buttons[deleteButton]
-        
-        # Add new entries to the Treeview
-        for idx, (file, new_file) in enumerate(results.items(), start=1):  # VERY IMPORTANT: THE LOOP THAT POPULATES THE TABLE IN THE UI
-            item_id = self.file_list.insert("", "end", values=(idx, self.getFileName(file), "Select Filetype"))
-            
-            # # Add a delete button aligned with the row
-            # self.create_delete_button(item_id)
+        self.row_entry_ids = {}
+        for item, (position, entry) in zip(items, rows):  # VERY IMPORTANT: THE LOOP THAT POPULATES THE TABLE IN THE UI
+            self.file_list.item(item, values=(position + 1, entry.name, entry.output_extension, entry.status))
+            self.row_entry_ids[item] = entry.entry_id
+        
+        # Update the scrollbar to show where the visible rows are in the whole list
+        total = len(self.file_model)
+        if total:
+            self.file_list_scrollbar.set(self.view_offset / total, (self.view_offset + len(rows)) / total)
+        else:
+            self.file_list_scrollbar.set(0, 1)
+    
+    def scroll_file_list(self, rows):
+        self.view_offset += rows
+        self.file_list.selection_remove(self.file_list.selection())  # The selected row would now show another file
+        self.refresh_file_list()
+    
+    def on_file_list_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.view_offset = int(float(amount) * len(self.file_model))
+            self.scroll_file_list(0)
+        elif action == "scroll":
+            step = self.visible_row_count if unit == "pages" else 1
+            self.scroll_file_list(int(amount) * step)
+    
+    def on_file_list_mouse_wheel(self, event):
+        self.scroll_file_list(-3 if event.delta > 0 else 3)
+    
+    def on_file_list_resize(self, event):
+        row_height = int(self.style.lookup('Treeview', 'rowheight') or 20)
+        visible_row_count = max(1, event.height // row_height - 1)  # One row's worth of space is taken by the headings
+        if visible_row_count != self.visible_row_count:
+            self.visible_row_count = visible_row_count
+            self.refresh_file_list()
     
     def clear_all_entries(self):
-        for item in self.file_list.get_children():  # Deletes it out of the UI
-            self.file_list.delete(item)
+        self.cancel_conversion()
         
-        # Delete the internal selected file list to fully clear everything
-        self.selected_file_list = []
+        # Delete the internal file list to fully clear everything, then empty the UI
+        self.file_model.clear()
+        self.view_offset = 0
+        self.refresh_file_list()
     
     def on_configure(self, event):
         self.root.update_idletasks()
@@ -327,115 +459,57 @@ class FileConverterApp:
         self.root_y = self.root.winfo_rooty()
         # print(f"Window moved. New root position: ({self.root_x}, {self.root_y})")
         
-    def text_file_to_pdf(self, text_file_path, output_pdf_path):
-        # Create a canvas object
-        c = canvas.Canvas(output_pdf_path, pagesize=letter)
-        width, height = letter
-        
-        # Set the font and size
-        font_name = "Helvetica"
-        font_size = 12
-        c.setFont(font_name, font_size)
-        
-        # Define the margin and line height
-        margin = 72  # 1 inch margin
-        line_height = font_size * 1.2  # line height (can be adjusted)
-        
-        # Read the text file
-        with open(text_file_path, 'r') as file:
-            text = file.readlines()
-        
-        # Calculate the maximum number of lines per page
-        max_lines_per_page = int((height - 2 * margin) / line_height)
-        
-        # Draw the text on the PDF
-        y = height - margin
-        for i, line in enumerate(text):
-            if i % max_lines_per_page == 0 and i != 0:
-                c.showPage()  # start a new page
-                c.setFont(font_name, font_size)
-                y = height - margin
-            
-            c.drawString(margin, y, line.strip())
-            y -= line_height
-        
-        # Save the PDF
-        c.save()
-    
-    def docx_to_pdf(self, docx_file_path, output_pdf_path):
-        # Convert the DOCX file to PDF
-        convert(docx_file_path, output_pdf_path)
-    
     def convert_file(self, conversion_extension):
-        # START - Scope Vars
-        img_file_extensions  = ['.bmp', '.BMP',
-                                '.jpg', '.JPG',
-                                '.png', '.PNG',
-                                '.pdf', '.PDF',
-                                '.jpeg', '.JPEG']
-        text_file_extensions = ['.txt', '.TXT',
-                                '.docx', '.DOCX']
-        vid_file_extensions  = ['.mp3', '.MP3',
-                                '.mp4', '.MP4',
-                                '.mov', '.MOV',
-                                '.avi', '.AVI']
-        # STOP - Scope Vars
-        
         if conversion_extension not in self.valid_extensions:  # Ensure that the inputted new file extension type is valid
             print("ERROR: Invalid conversion extension")
             messagebox.showwarning("No files selected", "Please select at least one file.")
             return  # STOPS function progression if error is detected
         
-        files_to_be_converted = []
-        for file in self.selected_file_list:  # Append the files that were previously selected to add them to the list
-            try:
-                files_to_be_converted.append(file)
-            except Exception as e:
-                print(f"An error occurred: {e}")
-        
-        for file in files_to_be_converted:  # Convert the files
-            currentFileType = os.path.splitext(file)[1]  # The current file's extension
-            
-            if (currentFileType in img_file_extensions) and (conversion_extension not in text_file_extensions):  # image files are handled under this if statement
-                if currentFileType == conversion_extension:  # Check if the current filetype is the same as the conversion extension
-                    print("The filetype of", file, "matches the current selected conversion type and therefore was not converted.")
-                img = Image.open(file)  # Open the file in question
-                output_file = os.path.splitext(file)[0] + conversion_extension  # Splits the filepath into a tuple where the left side is the filepath and the right side is the file extension
-                img.save(output_file, conversion_extension.replace(".", "").upper() )  # Saves the new converted image with the name and extension selected by the user
-                print(f"Successfully converted {file} to {output_file}")  # Prints that shit to the console rs type shit
-            elif currentFileType in text_file_extensions:  # Text files are handled under this elif
-                if currentFileType == conversion_extension:  # Check if the current filetype is the same as the conversion extension
-                    print("The filetype of", file, "matches the current selected conversion type and therefore was not converted.")
-                elif (conversion_extension == '.pdf' or conversion_extension == '.PDF') and (currentFileType == '.txt' or currentFileType == '.TXT'):  # TXT --> PDF
-                    output_file = os.path.splitext(file)[0] + conversion_extension  # Gets the output file path
-                    self.text_file_to_pdf(file, output_file)
-                    print(f"Successfully converted {file} to {output_file}")  # Prints that shit to the console type shit
-                elif (conversion_extension == '.pdf' or conversion_extension == '.PDF') and (currentFileType == '.docx' or currentFileType == '.DOCX'):  # TXT --> PDF
-                    output_file = os.path.splitext(file)[0] + conversion_extension  # Gets the output file path
-                    self.docx_to_pdf(file, output_file)
-                    print(f"Successfully converted {file} to {output_file}")  # Prints that shit to the console type shit
-                elif (conversion_extension == '.txt' or conversion_extension == '.TXT') and (currentFileType == '.docx' or currentFileType == '.DOCX'):  # DOCX --> TXT
-                    output_file = os.path.splitext(file)[0] + conversion_extension
-                    pypandoc.convert_file(file, 'plain', outputfile=output_file + conversion_extension)
-                    print(f"Successfully converted {file} to {output_file}")  # Prints that shit to the console type shit
-                elif (conversion_extension == '.docx' or conversion_extension == '.DOCX') and (currentFileType == '.txt' or currentFileType == '.TXT'):  # TXT --> DOCX
-                    output_file = os.path.splitext(file)[0] + conversion_extension
-                    document = Document()
-                    with open(file, 'r', encoding='utf-8') as myfile:
-                        myfile_content = myfile.read()
-                    myfile_content = re.sub(r'[^\x00-\x7F]+|\x0c', ' ', myfile_content)  # Remove all non-XML-compatible characters
-                    document.add_heading(os.path.basename(file), 0)
-                    document.add_paragraph(myfile_content)
-                    document.save(output_file)
-                    print(f"Successfully converted {file} to {output_file}")  # Prints that shit to the console type shit
-                else:
-                    print("ERROR: Control flow has failed in the convert_file function! Code: Inner")
-            elif (currentFileType in img_file_extensions) and (conversion_extension in text_file_extensions):  # Tell user you can't currently do image to text conversions
-                print("Image --> Text conversions are not currently supported, therefore:", file, "was not converted.")
-            elif (currentFileType in vid_file_extensions):  # Tell user you can't do any video conversions
-                print("No types of video files are currently supported, therefore:", file, "was not converted.")
+        if self.scheduler.is_running():
+            messagebox.showwarning("Conversion running", "Please wait for the current conversion to finish or cancel it.")
+            return
+        
+        if not len(self.file_model):
+            messagebox.showwarning("No files selected", "Please select at least one file.")
+            return
+        
+        # Start the batch in the background and poll for results from the Tk main loop
+        cache = ConversionCache() if self.use_cache_var.get() else None
+        self.batch_summary = BatchSummary()
+        self.scheduler = BatchScheduler(workers=self.worker_count_var.get(), cache=cache, observers=[self.batch_summary])
+        self.scheduler.start(self.file_model.paths(), conversion_extension)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.file_model.set_all_statuses("Queued")
+        self.refresh_file_list()
+        self.root.after(100, self.poll_conversion_results)
+    
+    def poll_conversion_results(self):
+        for result in self.scheduler.drain():
+            if result.status == FAILED:
+                print(f"ERROR: {result.message}")
             else:
-                print("ERROR: Control flow has failed in the convert_file function! Code: Outer")
+                print(result.message)
+            self.file_model.set_status(result.file, result.status.capitalize())
+        
+        self.refresh_file_list()
+        self.update_progress()
+        if self.scheduler.is_running() or not self.scheduler.results.empty():
+            self.root.after(100, self.poll_conversion_results)
+        else:
+            self.cancel_button.configure(state=tk.DISABLED)
+            print(self.batch_summary.describe())
+            self.show_summary()
+    
+    def update_progress(self):
+        summary = self.batch_summary
+        self.progress_bar.configure(maximum=max(summary.total, 1), value=summary.done)
+        self.progress_label.configure(text=f"{summary.done} / {summary.total} files    "
+                                           f"{summary.counts[FINISHED] / summary.elapsed:.1f} files/s")
+    
+    def cancel_conversion(self):
+        if self.scheduler.is_running():
+            print("Cancelling the current conversion")
+            self.scheduler.cancel()
 
 
 